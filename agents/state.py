@@ -53,6 +53,9 @@ class V3State(TypedDict, total=False):
     last_tried_page: int
     phase1_tried_pairs: List[Dict[str, Any]]  # [{"title": str, "page": int}, ...] already scraped
     phase1_rounds: int
+    prefilter_stats: Dict[str, int]  # {"scored", "pruned", "tokens_saved"} across Phase 1 rounds
     phase2_rounds: int
+    relevance_summaries: List[str]  # aligned with qualifying_jobs; written by the parallel relevance branch
     _log: Optional[Callable[[str], None]]
     _log_phase: int
+    _on_progress: Optional[Callable[[List[Dict[str, Any]]], None]]  # partial results as Phase 2/3 fill jobs in
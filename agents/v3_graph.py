@@ -3,175 +3,203 @@ V3 Agentic Workflow — Full LangGraph
 Phase 1: Gemini decides job titles, then agent loops (scraper tool + score) until 10+ jobs with score >= 85.
 Phase 2: Resume modifier (with search) generates tailored suggestions per job.
 Phase 3: Project proposer (with search) + future scores.
+Relevance summaries run as a parallel branch next to Phases 2-3 and are merged before results are written.
 """
 
 import json
+import math
 import os
 import re
 import sys
+import threading
 import time
-from typing import Any, Callable, Dict, List, Literal, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Literal, Optional, Union
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from langgraph.graph import END, StateGraph
-
 from agents.state import V3State
-from config import GEMINI_API_KEY, get_model_name
+from config import (
+    PHASE1_PLANNER_MODE,
+    PREFILTER_ENABLED,
+    PREFILTER_MIN_KEEP,
+    PREFILTER_MIN_SIMILARITY,
+    PROMPT_COVER_LETTER_MAX_TOKENS,
+    PROMPT_JOB_MAX_TOKENS,
+    PROMPT_PROJECTS_BATCH_TOKENS,
+    PROMPT_RELEVANCE_BATCH_TOKENS,
+    PROMPT_RESUME_MAX_TOKENS,
+    PROMPT_SCORING_BATCH_TOKENS,
+    PROMPT_SCORING_JOB_TOKENS,
+    PROMPT_WRITER_BATCH_TOKENS,
+    SCORE_CACHE_ENABLED,
+    SCORE_CACHE_MAX_ENTRIES,
+    SCORE_CACHE_TTL_SECONDS,
+    SCRAPE_SEARCH_TTL_SECONDS,
+    TITLE_CACHE_ENABLED,
+    TITLE_CACHE_MAX_ENTRIES,
+    TITLE_CACHE_TTL_SECONDS,
+    get_model_name,
+)
 from tools.scraper import scrape_jobs
 from tools.file_manager import update_relevant_jobs
+from tools.cache import PersistentCache, fingerprint, normalized_fingerprint
+from tools.llm_gateway import ProfileContext, generate_content, generate_text, generate_text_batch, get_profile_context
+from tools.prompt_budget import pack_descriptions, truncate_to_tokens
+from tools.rate_limiter import estimate_tokens
+from tools.relevance import job_text, similarity_scores
 
 # V3 constants
 V3_SCORE_THRESHOLD = 85
 V3_TARGET_QUALIFYING_JOBS = 10
 V3_PHASE1_MAX_ROUNDS = 15
-COOLDOWN_SECONDS = 4
+V3_PREFETCH_PAGES = 1  # upcoming (title, page) pairs scraped in the background while a batch is scored
+V3_PHASE1_SCRAPE_FANOUT = 4  # max (title, page) pairs scraped concurrently per planner round
+V3_EXPECTED_QUALIFYING_PER_PAGE = 5  # yield assumed before any page has been scored (pages are 10 jobs)
+V3_SCRAPE_MAX_WORKERS = 4  # bounded pool shared by concurrent scrapes and prefetches
 BATCH_SIZE = 3
 
-# Full resume/cover letter for prompts (high caps so all sections are included)
-V3_MAX_RESUME_CHARS: Optional[int] = 50_000
-V3_MAX_COVER_LETTER_CHARS: Optional[int] = 15_000
-
 
 def _resume_for_prompt(resume: str) -> str:
-    """Return full resume for prompt, up to safety cap. Consider all sections including Projects."""
+    """Return full resume for prompt, up to the token safety cap. Consider all sections including Projects."""
     if not resume:
         return ""
-    if V3_MAX_RESUME_CHARS is None:
-        return resume
-    return resume[:V3_MAX_RESUME_CHARS] if len(resume) > V3_MAX_RESUME_CHARS else resume
+    return truncate_to_tokens(resume, PROMPT_RESUME_MAX_TOKENS)
 
 
 def _cover_for_prompt(cover: str) -> str:
-    """Return full cover letter for prompt, up to safety cap."""
-    if not cover:
-        return ""
+    """Return full cover letter for prompt, up to the token safety cap."""
     text = (cover or "").strip()
     if not text:
         return ""
-    if V3_MAX_COVER_LETTER_CHARS is None:
-        return text
-    return text[:V3_MAX_COVER_LETTER_CHARS] if len(text) > V3_MAX_COVER_LETTER_CHARS else text
+    return truncate_to_tokens(text, PROMPT_COVER_LETTER_MAX_TOKENS)
 
 
-# ---------------------------------------------------------------------------
-# Helpers: Gemini client, rate limit, JSON parse
-# ---------------------------------------------------------------------------
+def _candidate_profile(resume_text: str, cover_letter_text: str) -> str:
+    """Resume + cover letter block shared by every prompt (sent once as cached content when possible)."""
+    resume = _resume_for_prompt(resume_text or "")
+    cover = _cover_for_prompt(cover_letter_text or "")
+    cl = f"\nCover letter:\n{cover}\n" if cover else ""
+    return (
+        f"=== CANDIDATE RESUME (read ALL sections including Work Experience, Projects, Education, Activities, Skills) ===\n"
+        f"{resume}\n{cl}"
+    )
 
-def _get_client():
-    from google import genai
-    return genai.Client(api_key=GEMINI_API_KEY)
 
+def profile_context(state: V3State) -> ProfileContext:
+    """The run's shared candidate profile; api._run_workflow retains it for the run's duration."""
+    return get_profile_context(_candidate_profile(state.get("resume") or "", state.get("cover_letter") or ""))
 
-_last_call_ts: float = 0.0
 
+# ---------------------------------------------------------------------------
+# Helpers: Gemini calls, JSON parse
+# ---------------------------------------------------------------------------
 
 def _rate_limited_gemini(
     prompt: str,
     max_attempts: int = 3,
     use_search_grounding: bool = False,
     config_extra: Optional[Any] = None,
+    context: Optional[ProfileContext] = None,
+    response_schema: Optional[Dict[str, Any]] = None,
 ) -> str:
-    global _last_call_ts
-    from google.genai import types
-    client = _get_client()
-    for attempt in range(max_attempts):
-        elapsed = time.time() - _last_call_ts
-        if elapsed < COOLDOWN_SECONDS:
-            time.sleep(COOLDOWN_SECONDS - elapsed)
-        try:
-            cfg = config_extra
-            if not cfg:
-                cfg = types.GenerateContentConfig(
-                    tools=[types.Tool(google_search=types.GoogleSearch())]
-                ) if use_search_grounding else None
-            _last_call_ts = time.time()
-            r = client.models.generate_content(
-                model=get_model_name(use_fallback=attempt >= 2),
-                contents=prompt,
-                config=cfg,
-            )
-            return r.text or ""
-        except Exception as e:
-            if "429" in str(e) and attempt < max_attempts - 1:
-                time.sleep(COOLDOWN_SECONDS * (2 ** attempt))
-            else:
-                if attempt == max_attempts - 1:
-                    print(f"[V3] Gemini failed: {str(e)[:120]}", flush=True)
-                time.sleep(COOLDOWN_SECONDS)
-    return ""
+    """Generate text through the shared LLM gateway (pooled client, rate limit, retries, profile context)."""
+    return generate_text(
+        prompt,
+        max_attempts=max_attempts,
+        use_search_grounding=use_search_grounding,
+        config=config_extra,
+        context=context,
+        response_schema=response_schema,
+    )
 
 
-def _extract_json_array(text: str) -> List[Dict]:
-    """Parse a JSON array from model output. Tolerates markdown and minor malformations."""
-    t = text.strip()
-    if t.startswith("```"):
-        t = t.split("```", 1)[1]
-        if t.startswith("json"):
-            t = t[4:]
-    start = t.find("[")
-    if start == -1:
-        return []
-    # Find matching closing bracket so we don't include trailing text or a second array
-    depth = 0
-    in_string = False
-    escape = False
-    end = -1
-    for i in range(start, len(t)):
-        c = t[i]
-        if escape:
-            escape = False
-            continue
-        if c == "\\" and in_string:
-            escape = True
-            continue
-        if in_string:
-            if c == in_string:
-                in_string = False
-            continue
-        if c in ('"', "'"):
-            in_string = c
+# Response schemas for structured output (Gemini OpenAPI subset). Search-grounded
+# stages cannot use a schema and describe the same shape in their prompt instead.
+def _object_array_schema(properties: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {name: {"type": t} for name, t in properties.items()},
+            "required": list(properties),
+        },
+    }
+
+
+TITLES_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}}
+SCORES_SCHEMA = _object_array_schema({"idx": "INTEGER", "score": "INTEGER"})
+FUTURE_SCORES_SCHEMA = _object_array_schema({"idx": "INTEGER", "future_score": "INTEGER"})
+RELEVANCE_SCHEMA = _object_array_schema({"idx": "INTEGER", "working": "STRING", "not_working": "STRING"})
+
+_json_decoder = json.JSONDecoder()
+
+
+def _decode_json(text: str) -> Any:
+    """
+    Decode the JSON value in model output. Schema-constrained responses are pure JSON;
+    grounded responses may add a code fence or a short preamble, so decoding starts at
+    the first '[' or '{' (then the other one, if a preamble like "note {x} [...]" trips the
+    first) and ignores anything after the value. None if nothing decodes.
+    """
+    t = (text or "").strip()
+    for start in sorted(i for i in (t.find("["), t.find("{")) if i != -1):
+        try:
+            return _json_decoder.raw_decode(t, start)[0]
+        except json.JSONDecodeError:
             continue
-        if c == "[":
-            depth += 1
-        elif c == "]":
-            depth -= 1
-            if depth == 0:
-                end = i + 1
+    return None
+
+
+class _JsonArrayStream:
+    """
+    Incremental decoder for a streamed JSON array: feed() takes the response text so far
+    and returns the top-level elements completed since the previous call. Each element is
+    decoded once with raw_decode; incomplete trailing elements wait for more text.
+    """
+
+    _SEPARATORS = re.compile(r"[\s,]*")
+    _DELIMITERS = frozenset(", \t\r\n]")
+
+    def __init__(self):
+        self._text = ""
+        self._pos: Optional[int] = None  # next unread offset inside the array
+
+    def feed(self, text: str) -> List[Any]:
+        if not text.startswith(self._text):
+            # The gateway retried and the text started over
+            self._pos = None
+        self._text = text
+        if self._pos is None:
+            start = text.find("[")
+            if start == -1:
+                return []
+            self._pos = start + 1
+        out = []
+        while True:
+            pos = self._SEPARATORS.match(text, self._pos).end()
+            if pos >= len(text) or text[pos] == "]":
                 break
-    if end <= start:
-        end = t.rfind("]") + 1
-    if end <= start:
-        return []
-    raw = t[start:end]
-    # Fix common model mistakes: missing comma between } and {
-    raw = re.sub(r"\}\s*\n\s*\{", "},{", raw)
-    try:
-        parsed = json.loads(raw)
-        if isinstance(parsed, list):
-            return [x for x in parsed if isinstance(x, dict)]
-    except json.JSONDecodeError:
-        pass
-    return []
-
-
-def _extract_json_string_array(text: str) -> List[str]:
-    """Parse a JSON array of strings, e.g. [\"Title A\", \"Title B\"]."""
-    t = text.strip()
-    if t.startswith("```"):
-        t = t.split("```", 1)[1]
-        if t.startswith("json"):
-            t = t[4:]
-    start, end = t.find("["), t.rfind("]") + 1
-    if start == -1 or end <= start:
-        return []
-    try:
-        parsed = json.loads(t[start:end])
-        if not isinstance(parsed, list):
-            return []
-        return [str(x).strip() for x in parsed if x][:5]
-    except (json.JSONDecodeError, TypeError):
+            try:
+                value, end = _json_decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                break
+            if not isinstance(value, (dict, list, str)) and (end >= len(text) or text[end] not in self._DELIMITERS):
+                break  # a number may still be growing ("3" of "3.5"); wait for what follows it
+            out.append(value)
+            self._pos = end
+        return out
+
+
+def _extract_json_array(text: str) -> List[Dict]:
+    """Objects of a JSON array in model output (also accepts a {"key": [...]} wrapper)."""
+    parsed = _decode_json(text)
+    if isinstance(parsed, dict):
+        parsed = next((v for v in parsed.values() if isinstance(v, list)), None)
+    if not isinstance(parsed, list):
         return []
+    return [x for x in parsed if isinstance(x, dict)]
 
 
 def _normalize_function_call_args(fc: Any) -> Dict[str, Any]:
@@ -199,6 +227,55 @@ def _normalize_function_call_args(fc: Any) -> Dict[str, Any]:
     return out
 
 
+def _publish_progress(state: V3State) -> None:
+    """Hand the current qualifying jobs to the caller's progress hook (partial results)."""
+    fn = state.get("_on_progress")
+    if fn:
+        try:
+            fn(state.get("qualifying_jobs") or [])
+        except Exception as e:
+            print(f"[V3] Progress callback failed: {e}", flush=True)
+
+
+_progress_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="v3-progress")
+
+
+class _ProgressCoalescer:
+    """
+    Publishes progress for streaming callbacks without running the hook on the gateway loop.
+    request() is cheap: it marks an update pending and, if no publish is queued, schedules one
+    on _progress_pool. Requests that arrive while a publish runs collapse into one more publish
+    of the latest state. flush() waits for the last one.
+    """
+
+    def __init__(self, state: V3State):
+        self._state = state
+        self._lock = threading.Lock()
+        self._pending = False
+        self._future: Optional[Future] = None
+
+    def request(self) -> None:
+        with self._lock:
+            self._pending = True
+            if self._future is None:
+                self._future = _progress_pool.submit(self._drain)
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._future = None
+                    return
+                self._pending = False
+            _publish_progress(self._state)
+
+    def flush(self) -> None:
+        with self._lock:
+            fut = self._future
+        if fut is not None:
+            fut.result()
+
+
 def _log(state: V3State, msg: str):
     fn = state.get("_log")
     if fn:
@@ -212,12 +289,35 @@ def _log(state: V3State, msg: str):
 # Phase 1: Decide titles
 # ---------------------------------------------------------------------------
 
+_title_cache = PersistentCache("suggested_titles", TITLE_CACHE_TTL_SECONDS, TITLE_CACHE_MAX_ENTRIES, memory_entries=256)
+
+
+def _format_insensitive(text: str) -> str:
+    """Lowercase alphanumeric words only, so bullets, punctuation and layout changes don't matter."""
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+def _title_cache_keys(resume: str, cover: str, job_type: str) -> List[str]:
+    """Exact key first, then the format-insensitive fast-path key."""
+    return [
+        f"{job_type}:exact:{fingerprint(resume)}:{fingerprint(cover)}",
+        f"{job_type}:fmt:{fingerprint(_format_insensitive(resume))}:{fingerprint(_format_insensitive(cover))}",
+    ]
+
+
 def decide_titles_node(state: V3State) -> Dict[str, Any]:
     _log(state, "Analyzing resume and cover letter to suggest job titles...")
     resume = _resume_for_prompt(state.get("resume") or "")
     cover = _cover_for_prompt(state.get("cover_letter") or "")
     job_type = (state.get("job_type") or "full_time").strip().lower()
-    cl = f"\nCover letter:\n{cover}\n" if cover else ""
+    cache_keys = _title_cache_keys(resume, cover, job_type)
+    if TITLE_CACHE_ENABLED:
+        for kind, key in zip(("unchanged", "only formatting changed"), cache_keys):
+            cached = _title_cache.get(key)
+            if isinstance(cached, list) and cached:
+                titles = [str(t) for t in cached]
+                _log(state, f"Suggested job titles (reused, resume {kind}): {', '.join(titles)}")
+                return {"suggested_titles": titles}
     if job_type == "full_time":
         type_instruction = (
             "Output 1 to 3 job titles for FULL-TIME roles only. Do NOT include 'Intern' or 'Internship' in any title. "
@@ -238,31 +338,25 @@ def decide_titles_node(state: V3State) -> Dict[str, Any]:
         )
         max_titles = 4
     prompt = (
-        f"Based on this candidate profile, suggest job titles for LinkedIn job search.\n\n"
+        f"Based on the candidate profile above, suggest job titles for LinkedIn job search.\n\n"
         f"{type_instruction}\n\n"
-        f"=== CANDIDATE RESUME (read ALL sections including Work Experience, Projects, Education, Activities, Skills) ===\n{resume}\n{cl}\n"
-        f"IMPORTANT: You MUST consider ALL sections above, including Projects and other roles/experience at the end of the resume.\n\n"
-        f"Return ONLY a JSON array of strings. No explanation, no markdown, no code fences."
+        f"IMPORTANT: You MUST consider ALL sections of the resume above, including Projects and other roles/experience at the end of the resume.\n\n"
+        f"Return a JSON array of job title strings."
     )
-    text = _rate_limited_gemini(prompt)
-    titles: List[str] = _extract_json_string_array(text)
-    if not titles and text.strip():
-        arr = _extract_json_array(text)
-        for x in arr:
-            if isinstance(x, dict) and "title" in x:
-                titles.append(str(x["title"]).strip())
-            elif isinstance(x, dict) and "name" in x:
-                titles.append(str(x["name"]).strip())
-        if not titles and "[" in text:
-            try:
-                parsed = json.loads(text[text.find("["):text.rfind("]")+1])
-                if isinstance(parsed, list):
-                    titles = [str(p).strip() for p in parsed if p][:max_titles]
-            except Exception:
-                pass
+    text = _rate_limited_gemini(prompt, context=profile_context(state), response_schema=TITLES_SCHEMA)
+    parsed = _decode_json(text)
+    titles: List[str] = []
+    for x in parsed if isinstance(parsed, list) else []:
+        if isinstance(x, dict):
+            x = x.get("title") or x.get("name")
+        if x:
+            titles.append(str(x).strip())
+    titles = [t for t in titles if t][:max_titles]
+    if titles and TITLE_CACHE_ENABLED:
+        for key in cache_keys:
+            _title_cache.set(key, titles)
     if not titles:
         titles = ["Software Engineer"] if job_type == "full_time" else ["Software Engineer Intern"]
-    titles = [t for t in titles if t][:max_titles]
     _log(state, f"Suggested job titles: {', '.join(titles)}")
     return {"suggested_titles": titles}
 
@@ -287,7 +381,7 @@ def _scrape_linkedin_tool(job_title: str, page: int) -> List[Dict]:
             "title": j.get("title") or "N/A",
             "company": j.get("company") or "N/A",
             "location": j.get("location") or "N/A",
-            "description": (j.get("description") or "")[:2000],
+            "description": j.get("description") or "",
             "salary": j.get("salary") or "",
             "url": url,
             "source": j.get("source") or "linkedin",
@@ -349,6 +443,153 @@ def _get_next_title_page(
     return None
 
 
+def _plan_next_pair(
+    suggested_titles: List[str],
+    tried_pairs: List[Dict[str, Any]],
+    max_page_per_title: int = 5,
+) -> Optional[tuple]:
+    """
+    Yield-aware round-robin over titles, using jobs_returned / qualifying_added from history.
+    Untried titles go first (in suggested order). Titles whose last page came back empty are
+    skipped. Among the rest, the best smoothed qualifying rate wins; ties go to the title
+    with fewer scrapes so far.
+    """
+    titles = [t.strip() for t in (suggested_titles or ["Software Engineer"]) if t and t.strip()]
+    stats: Dict[str, Dict[str, Any]] = {t: {"pages": set(), "returned": 0, "qualified": 0, "last_returned": None} for t in titles}
+    for p in tried_pairs or []:
+        st = stats.get((p.get("title") or "").strip())
+        if st is None:
+            continue
+        try:
+            st["pages"].add(int(p.get("page", 0)))
+        except (TypeError, ValueError):
+            st["pages"].add(0)
+        returned = p.get("jobs_returned")
+        qualified = p.get("qualifying_added")
+        st["returned"] += returned if isinstance(returned, int) else 0
+        st["qualified"] += qualified if isinstance(qualified, int) else 0
+        st["last_returned"] = returned if isinstance(returned, int) else st["last_returned"]
+
+    best = None
+    best_key = None
+    for order, title in enumerate(titles):
+        st = stats[title]
+        next_page = next((pg for pg in range(max_page_per_title + 1) if pg not in st["pages"]), None)
+        if next_page is None or st["last_returned"] == 0:
+            continue
+        tries = len(st["pages"])
+        rate = (st["qualified"] + 1) / (st["returned"] + 2)
+        key = (tries == 0, rate, -tries, -order)
+        if best_key is None or key > best_key:
+            best, best_key = (title, next_page), key
+    return best
+
+
+def _phase1_stalled(tried_pairs: List[Dict[str, Any]], window: int = 2) -> bool:
+    """True when the last `window` scored rounds added no qualifying jobs (worth asking the LLM)."""
+    scored = [p for p in tried_pairs or [] if "qualifying_added" in p]
+    if len(scored) < window:
+        return False
+    return all(not p.get("qualifying_added") for p in scored[-window:])
+
+
+def _expected_qualifying_per_page(tried_pairs: List[Dict[str, Any]]) -> float:
+    """Mean qualifying jobs per scored (title, page) so far, or the prior before anything is scored."""
+    scored = [p for p in tried_pairs or [] if "qualifying_added" in p]
+    if not scored:
+        return V3_EXPECTED_QUALIFYING_PER_PAGE
+    return sum(p.get("qualifying_added") or 0 for p in scored) / len(scored)
+
+
+def _phase1_fanout(remaining: int, tried_pairs: List[Dict[str, Any]]) -> int:
+    """Pairs to scrape this round: enough pages to cover the remaining need at the observed yield."""
+    per_page = _expected_qualifying_per_page(tried_pairs)
+    if per_page <= 0:
+        return V3_PHASE1_SCRAPE_FANOUT
+    return max(1, min(V3_PHASE1_SCRAPE_FANOUT, math.ceil(remaining / per_page)))
+
+
+def _plan_next_pairs(
+    suggested_titles: List[str],
+    tried_pairs: List[Dict[str, Any]],
+    limit: int,
+) -> List[tuple]:
+    """Up to `limit` planned (title, page) pairs for one round, at most one page per title."""
+    pairs: List[tuple] = []
+    remaining = [t for t in (suggested_titles or []) if t and t.strip()]
+    while len(pairs) < limit and remaining:
+        pair = _plan_next_pair(remaining, tried_pairs)
+        if not pair:
+            break
+        pairs.append(pair)
+        remaining = [t for t in remaining if t.strip() != pair[0]]
+    return pairs
+
+
+# ---------------------------------------------------------------------------
+# Phase 1: Concurrent scraping + speculative prefetch
+# Pairs for one round are scraped in parallel on a bounded pool. The next (title, page)
+# is predictable, so it is also scraped in the background while the current batch is
+# scored and the agent decides; the tool node picks it up if chosen.
+# Prefetched batches are shared across runs but expire with the scraper's search TTL,
+# so a later run never gets postings older than a fresh scrape would return.
+# ---------------------------------------------------------------------------
+
+_PREFETCH_MAX_ENTRIES = 32
+_scrape_pool = ThreadPoolExecutor(max_workers=V3_SCRAPE_MAX_WORKERS, thread_name_prefix="phase1-scrape")
+_prefetched: "OrderedDict[tuple, tuple]" = OrderedDict()  # (title, page) -> (Future, submitted_at)
+_prefetch_lock = threading.Lock()
+
+
+def _drop_stale_prefetches() -> None:
+    """Forget prefetches submitted more than SCRAPE_SEARCH_TTL_SECONDS ago. Caller holds _prefetch_lock."""
+    cutoff = time.monotonic() - SCRAPE_SEARCH_TTL_SECONDS
+    while _prefetched:
+        _, submitted_at = next(iter(_prefetched.values()))
+        if submitted_at >= cutoff:
+            return
+        _prefetched.popitem(last=False)
+
+
+def _prefetch_scrape(job_title: str, page: int) -> None:
+    """Start scraping (job_title, page) in the background unless already in flight."""
+    key = (job_title, page)
+    with _prefetch_lock:
+        _drop_stale_prefetches()
+        if key in _prefetched:
+            return
+        _prefetched[key] = (_scrape_pool.submit(_scrape_linkedin_tool, job_title, page), time.monotonic())
+        while len(_prefetched) > _PREFETCH_MAX_ENTRIES:
+            # Dropped futures still finish and warm the scraper's page cache.
+            _prefetched.popitem(last=False)
+
+
+def _take_prefetched(job_title: str, page: int) -> Optional[List[Dict]]:
+    """Return the prefetched batch for (job_title, page), waiting if still in flight; None if not prefetched or stale."""
+    with _prefetch_lock:
+        _drop_stale_prefetches()
+        entry = _prefetched.pop((job_title, page), None)
+    if entry is None:
+        return None
+    fut, _ = entry
+    try:
+        return fut.result()
+    except Exception as e:
+        print(f"[V3] Prefetch for ({job_title!r}, {page}) failed: {e}", flush=True)
+        return None
+
+
+def _prefetch_upcoming(suggested_titles: List[str], tried_pairs: List[Dict[str, Any]]) -> None:
+    """Prefetch the next V3_PREFETCH_PAGES pairs the planner would most likely pick."""
+    upcoming = list(tried_pairs)
+    for _ in range(V3_PREFETCH_PAGES):
+        pair = _plan_next_pair(suggested_titles, upcoming) or _get_next_title_page(suggested_titles, upcoming)
+        if not pair:
+            return
+        _prefetch_scrape(*pair)
+        upcoming.append({"title": pair[0], "page": pair[1]})
+
+
 def phase1_agent_node(state: V3State) -> Dict[str, Any]:
     suggested = state.get("suggested_titles") or []
     qualifying = state.get("qualifying_jobs") or []
@@ -366,6 +607,21 @@ def phase1_agent_node(state: V3State) -> Dict[str, Any]:
     if not next_pair:
         _log(state, f"All (title, page) combinations exhausted. Moving to Phase 2 with {n} jobs.")
         return {"phase1_last_tool_call": None}
+    planned_pair = _plan_next_pair(suggested, tried_pairs) or next_pair
+    fanout = _phase1_fanout(V3_TARGET_QUALIFYING_JOBS - n, tried_pairs)
+
+    # First round: page 0 of several suggested titles at once (no history for the agent to reason about yet)
+    if not tried_pairs and len(suggested) > 1 and fanout > 1:
+        pairs = [{"job_title": t, "page": 0} for t in suggested[:fanout]]
+        _log(state, f"Scraping page 0 of {len(pairs)} titles concurrently")
+        return {"phase1_last_tool_call": {"name": "scrape_linkedin", "args": {"pairs": pairs}}}
+
+    use_llm = PHASE1_PLANNER_MODE == "llm" or (PHASE1_PLANNER_MODE == "hybrid" and _phase1_stalled(tried_pairs))
+    if not use_llm:
+        planned = _plan_next_pairs(suggested, tried_pairs, fanout) or [planned_pair]
+        pairs = [{"job_title": t, "page": pg} for t, pg in planned]
+        _log(state, "Planner calling " + ", ".join(f"scrape_linkedin({p['job_title']!r}, page={p['page']})" for p in pairs))
+        return {"phase1_last_tool_call": {"name": "scrape_linkedin", "args": {"pairs": pairs}}}
 
     # Build rich scrape history for the LLM
     history_lines = []
@@ -394,21 +650,19 @@ def phase1_agent_node(state: V3State) -> Dict[str, Any]:
     )
 
     from google.genai import types
-    global _last_call_ts
-    client = _get_client()
-    elapsed = time.time() - _last_call_ts
-    if elapsed < COOLDOWN_SECONDS:
-        time.sleep(COOLDOWN_SECONDS - elapsed)
     try:
-        _last_call_ts = time.time()
-        r = client.models.generate_content(
+        r = generate_content(
+            prompt,
             model=get_model_name(),
-            contents=prompt,
             config=types.GenerateContentConfig(tools=[_phase1_tool_declaration()]),
         )
     except Exception as e:
         print(f"[V3] Phase1 agent call failed: {e}", flush=True)
-        return {"phase1_last_tool_call": None}
+        if PHASE1_PLANNER_MODE == "llm":
+            return {"phase1_last_tool_call": None}
+        job_title, page = planned_pair
+        _log(state, f"Agent unavailable; planner calling scrape_linkedin({job_title!r}, page={page})")
+        return {"phase1_last_tool_call": {"name": "scrape_linkedin", "args": {"job_title": job_title, "page": page}}}
 
     fc = None
     if r.candidates and r.candidates[0].content and r.candidates[0].content.parts:
@@ -439,7 +693,7 @@ def phase1_agent_node(state: V3State) -> Dict[str, Any]:
 
         # Safety net: if LLM picked a (title, page) already tried, override deterministically
         if (job_title, page) in tried_set:
-            override_title, override_page = next_pair
+            override_title, override_page = planned_pair
             _log(state, f"Agent picked already-tried ({job_title!r}, {page}); overriding to ({override_title!r}, {override_page})")
             job_title, page = override_title, override_page
 
@@ -448,67 +702,165 @@ def phase1_agent_node(state: V3State) -> Dict[str, Any]:
     return {"phase1_last_tool_call": None}
 
 
+def _tool_call_pairs(args: Dict[str, Any], suggested: List[str], state: V3State) -> List[tuple]:
+    """Normalize a scrape_linkedin call (single job_title/page or a `pairs` list) to valid (title, page) pairs."""
+    raw_pairs = args.get("pairs") or [args]
+    pairs: List[tuple] = []
+    for raw in raw_pairs:
+        job_title = (raw.get("job_title") or "").strip()
+        if not job_title or (suggested and job_title not in suggested):
+            job_title = suggested[0] if suggested else "Software Engineer"
+            _log(state, f"Using suggested title for scraper: {job_title!r}")
+        try:
+            page = int(raw.get("page", 0))
+        except (TypeError, ValueError):
+            page = 0
+        if (job_title, page) not in pairs:
+            pairs.append((job_title, page))
+    return pairs
+
+
 def phase1_tool_node(state: V3State) -> Dict[str, Any]:
     tool = state.get("phase1_last_tool_call")
     if not tool or tool.get("name") != "scrape_linkedin":
         return {"current_batch": [], "phase1_last_tool_call": None, "phase1_tried_pairs": state.get("phase1_tried_pairs") or []}
     args = tool.get("args") or {}
     suggested = state.get("suggested_titles") or []
-    job_title = (args.get("job_title") or "").strip()
-    if not job_title or (suggested and job_title not in suggested):
-        job_title = suggested[0] if suggested else "Software Engineer"
-        _log(state, f"Using suggested title for scraper: {job_title!r}")
-    try:
-        page = int(args.get("page", 0))
-    except (TypeError, ValueError):
-        page = 0
+    pairs = _tool_call_pairs(args, suggested, state)
     seen = list(state.get("seen_urls") or [])
-    batch = _scrape_linkedin_tool(job_title, page)
-    fresh = []
-    for j in batch:
-        url = j.get("url") or ""
-        if url and url not in seen:
-            seen.append(url)
-            fresh.append(j)
-    if fresh:
-        _log(state, f"Scraped {len(fresh)} new jobs (page {page}, title {job_title!r})")
-    else:
-        _log(state, f"Scraped 0 new jobs for {job_title!r} page {page}")
+    seen_set = set(seen)
+
+    # Start every pair on the bounded pool (already-prefetched pairs are reused), then join in order
+    for job_title, page in pairs:
+        _prefetch_scrape(job_title, page)
     existing_tried = list(state.get("phase1_tried_pairs") or [])
-    existing_tried.append({"title": job_title, "page": page, "jobs_returned": len(fresh)})
+    fresh = []
+    for job_title, page in pairs:
+        batch = _take_prefetched(job_title, page)
+        if batch is None:
+            batch = _scrape_linkedin_tool(job_title, page)
+        added = 0
+        for j in batch:
+            url = j.get("url") or ""
+            if url and url not in seen_set:
+                seen_set.add(url)
+                seen.append(url)
+                j["search_title"] = job_title
+                j["search_page"] = page
+                fresh.append(j)
+                added += 1
+        if added:
+            _log(state, f"Scraped {added} new jobs (page {page}, title {job_title!r})")
+        else:
+            _log(state, f"Scraped 0 new jobs for {job_title!r} page {page}")
+        existing_tried.append({"title": job_title, "page": page, "jobs_returned": added})
+    # Skip the prefetch when this batch is expected to reach the target on its own
+    expected_added = min(len(fresh), _expected_qualifying_per_page(existing_tried) * len(pairs))
+    if len(state.get("qualifying_jobs") or []) + expected_added < V3_TARGET_QUALIFYING_JOBS:
+        _prefetch_upcoming(suggested, existing_tried)
+    last_title, last_page = pairs[-1]
     return {
         "current_batch": fresh,
         "seen_urls": seen,
         "phase1_last_tool_call": None,
-        "last_tried_title": job_title,
-        "last_tried_page": page,
+        "last_tried_title": last_title,
+        "last_tried_page": last_page,
         "phase1_tried_pairs": existing_tried,
     }
 
 
+_score_cache = PersistentCache("job_scores", SCORE_CACHE_TTL_SECONDS, SCORE_CACHE_MAX_ENTRIES)
+
+
+def _score_cache_key(profile_fp: str, job: Dict[str, Any]) -> Optional[str]:
+    """Cache key for a job's score under a given profile; None if the posting has no URL."""
+    url = job.get("url") or ""
+    if not url:
+        return None
+    return fingerprint(profile_fp, url, fingerprint(job.get("description") or ""))
+
+
+def _scoring_prompt_entry(idx: int, job: Dict[str, Any], description: Optional[str] = None) -> Dict[str, Any]:
+    if description is None:
+        description = truncate_to_tokens(job.get("description") or "", PROMPT_SCORING_JOB_TOKENS)
+    return {"idx": idx, "title": job.get("title", "N/A"), "company": job.get("company", "N/A"),
+            "location": job.get("location", "N/A"), "description": description, "salary": job.get("salary", "")}
+
+
+def _scoring_prompt_entries(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Prompt entries for a scoring batch, with descriptions packed to PROMPT_SCORING_BATCH_TOKENS."""
+    descs = pack_descriptions([j.get("description") or "" for j in jobs], PROMPT_SCORING_BATCH_TOKENS, PROMPT_SCORING_JOB_TOKENS)
+    return [_scoring_prompt_entry(i, j, d) for i, (j, d) in enumerate(zip(jobs, descs))]
+
+
+def _prefilter_batch(state: V3State, batch: List[Dict[str, Any]]) -> tuple:
+    """
+    Rank the batch by local resume similarity and drop jobs below PREFILTER_MIN_SIMILARITY
+    (always keeping the top PREFILTER_MIN_KEEP). Returns (kept_jobs, stats_update).
+    """
+    stats = dict(state.get("prefilter_stats") or {"scored": 0, "pruned": 0, "tokens_saved": 0})
+    if not PREFILTER_ENABLED or len(batch) <= PREFILTER_MIN_KEEP:
+        stats["scored"] = stats.get("scored", 0) + len(batch)
+        return batch, stats
+    try:
+        sims = similarity_scores(state.get("resume") or "", [job_text(j) for j in batch])
+    except Exception as e:
+        print(f"[V3] Pre-filter unavailable ({e}); scoring full batch", flush=True)
+        stats["scored"] = stats.get("scored", 0) + len(batch)
+        return batch, stats
+    ranked = sorted(range(len(batch)), key=lambda i: sims[i], reverse=True)
+    keep_idx = [i for rank, i in enumerate(ranked) if rank < PREFILTER_MIN_KEEP or sims[i] >= PREFILTER_MIN_SIMILARITY]
+    keep_set = set(keep_idx)
+    kept = [batch[i] for i in keep_idx]
+    pruned = [batch[i] for i in range(len(batch)) if i not in keep_set]
+    tokens_saved = sum(estimate_tokens(json.dumps(_scoring_prompt_entry(0, j), indent=1)) for j in pruned)
+    stats["scored"] = stats.get("scored", 0) + len(kept)
+    stats["pruned"] = stats.get("pruned", 0) + len(pruned)
+    stats["tokens_saved"] = stats.get("tokens_saved", 0) + tokens_saved
+    if pruned:
+        _log(state, f"Pre-filter: skipped {len(pruned)}/{len(batch)} low-similarity jobs (< {PREFILTER_MIN_SIMILARITY:.2f}), "
+                    f"saving ~{tokens_saved:,} scoring tokens (run total ~{stats['tokens_saved']:,}).")
+    return kept, stats
+
+
 def score_batch_node(state: V3State) -> Dict[str, Any]:
     batch = state.get("current_batch") or []
     tried_pairs = list(state.get("phase1_tried_pairs") or [])
     if not batch:
+        for p in tried_pairs:
+            p.setdefault("qualifying_added", 0)
         return {"current_batch": [], "last_scrape_result_count": 0, "last_qualifying_added_count": 0, "phase1_tried_pairs": tried_pairs}
 
-    resume = _resume_for_prompt(state.get("resume") or "")
-    cover = _cover_for_prompt(state.get("cover_letter") or "")
-    cl_section = f"\nCover letter:\n{cover}\n" if cover else ""
-    jobs_for_prompt = [
-        {"idx": i, "title": j.get("title", "N/A"), "company": j.get("company", "N/A"),
-         "location": j.get("location", "N/A"), "description": (j.get("description") or "")[:350], "salary": j.get("salary", "")}
-        for i, j in enumerate(batch)
-    ]
-    prompt = (
-        f"Score each job 0-100 for relevance to this candidate.\n\n"
-        f"Jobs:\n{json.dumps(jobs_for_prompt, indent=1)}\n\n"
-        f"=== CANDIDATE RESUME (read ALL sections including Work Experience, Projects, Education, Activities, Skills) ===\n{resume}\n{cl_section}\n"
-        f"IMPORTANT: You MUST consider ALL sections of the resume above, including Projects and other roles/experience at the end.\n\n"
-        f"Return ONLY a JSON array: [{{\"idx\": 0, \"score\": 85}}, ...]. No explanation."
-    )
-    _log(state, f"Scoring {len(batch)} jobs...")
-    text = _rate_limited_gemini(prompt)
+    scraped_count = len(batch)
+
+    # Reuse scores from earlier runs with the same (normalized) resume + cover letter
+    profile_fp = normalized_fingerprint(state.get("resume") or "", state.get("cover_letter") or "")
+    cached_scores: Dict[int, int] = {}
+    if SCORE_CACHE_ENABLED:
+        for i, j in enumerate(batch):
+            key = _score_cache_key(profile_fp, j)
+            hit = _score_cache.get(key) if key else None
+            if isinstance(hit, int):
+                cached_scores[i] = hit
+    for i, sc in cached_scores.items():
+        batch[i]["score"] = sc
+    cached_jobs = [batch[i] for i in sorted(cached_scores)]
+    if cached_jobs:
+        _log(state, f"Reused {len(cached_jobs)} cached scores.")
+    uncached = [j for i, j in enumerate(batch) if i not in cached_scores]
+
+    to_score, prefilter_stats = _prefilter_batch(state, uncached)
+    text = ""
+    if to_score:
+        jobs_for_prompt = _scoring_prompt_entries(to_score)
+        prompt = (
+            f"Score each job 0-100 for relevance to the candidate above.\n\n"
+            f"Jobs:\n{json.dumps(jobs_for_prompt, indent=1)}\n\n"
+            f"IMPORTANT: You MUST consider ALL sections of the resume above, including Projects and other roles/experience at the end.\n\n"
+            f"Return a JSON array with one {{\"idx\", \"score\"}} object per job."
+        )
+        _log(state, f"Scoring {len(to_score)} jobs...")
+        text = _rate_limited_gemini(prompt, context=profile_context(state), response_schema=SCORES_SCHEMA)
     score_map = {}
     if text.strip():
         for s in _extract_json_array(text):
@@ -519,35 +871,55 @@ def score_batch_node(state: V3State) -> Dict[str, Any]:
                     score_map[int(idx)] = max(0, min(100, int(sc)))
                 except (ValueError, TypeError):
                     pass
+    for i, j in enumerate(to_score):
+        j["score"] = score_map.get(i, 70)
+        key = _score_cache_key(profile_fp, j) if SCORE_CACHE_ENABLED and i in score_map else None
+        if key:
+            _score_cache.set(key, score_map[i])
+    batch = cached_jobs + to_score
     qualifying_jobs = list(state.get("qualifying_jobs") or [])
     added = 0
-    for i, j in enumerate(batch):
-        sc = score_map.get(i, 70)
-        j["score"] = sc
+    for j in batch:
+        sc = j["score"]
         if sc >= V3_SCORE_THRESHOLD:
             qualifying_jobs.append(j)
             added += 1
     _log(state, f"Added {added} qualifying jobs (total {len(qualifying_jobs)})")
+    if len(qualifying_jobs) > V3_TARGET_QUALIFYING_JOBS:
+        # Phases 2/3 cost LLM calls per job; keep only the best matches (stable for equal scores)
+        qualifying_jobs = sorted(qualifying_jobs, key=lambda j: j.get("score", 0), reverse=True)[:V3_TARGET_QUALIFYING_JOBS]
+        _log(state, f"Keeping the top {V3_TARGET_QUALIFYING_JOBS} qualifying jobs by match score")
     rounds = (state.get("phase1_rounds") or 0) + 1
-    # Enrich the latest tried_pairs entry with how many qualified from this batch
-    if tried_pairs:
-        tried_pairs[-1]["qualifying_added"] = added
+    # Enrich this round's tried_pairs entries with how many qualified from each (title, page)
+    added_by_pair: Dict[tuple, int] = {}
+    for j in batch:
+        if j.get("score", 0) >= V3_SCORE_THRESHOLD:
+            key = (j.get("search_title"), j.get("search_page"))
+            added_by_pair[key] = added_by_pair.get(key, 0) + 1
+    for p in tried_pairs:
+        if "qualifying_added" not in p:
+            p["qualifying_added"] = added_by_pair.get((p.get("title"), p.get("page")), 0)
     return {
         "qualifying_jobs": qualifying_jobs,
         "current_batch": [],
-        "last_scrape_result_count": len(batch),
+        "last_scrape_result_count": scraped_count,
         "last_qualifying_added_count": added,
         "phase1_rounds": rounds,
         "phase1_tried_pairs": tried_pairs,
+        "prefilter_stats": prefilter_stats,
     }
 
 
-def phase1_route(state: V3State) -> Literal["phase1_tools", "resume_modifier_agent", "phase1_agent"]:
+# Independent stages started together once Phase 1 is done; joined again at merge_results.
+PHASE2_BRANCHES = ["resume_modifier_agent", "relevance_summary"]
+
+
+def phase1_route(state: V3State) -> Union[Literal["phase1_tools", "phase1_agent"], List[str]]:
     qualifying = state.get("qualifying_jobs") or []
     if len(qualifying) >= V3_TARGET_QUALIFYING_JOBS:
-        return "resume_modifier_agent"
+        return PHASE2_BRANCHES
     if state.get("phase1_rounds", 0) >= V3_PHASE1_MAX_ROUNDS:
-        return "resume_modifier_agent"
+        return PHASE2_BRANCHES
     if state.get("phase1_last_tool_call"):
         return "phase1_tools"
     return "phase1_agent"
@@ -557,19 +929,17 @@ def phase1_route(state: V3State) -> Literal["phase1_tools", "resume_modifier_age
 # Phase 2: Resume modifier (generates tailored suggestions per job)
 # ---------------------------------------------------------------------------
 
-def _batch_writer_prompt(jobs_batch: List[Dict], resume_text: str, cover_letter_text: str) -> str:
-    resume = _resume_for_prompt(resume_text or "")
-    cover = _cover_for_prompt(cover_letter_text or "")
-    cl = f"\nCover letter:\n{cover}\n" if cover else ""
+def _batch_writer_prompt(jobs_batch: List[Dict]) -> str:
+    descs = pack_descriptions([j.get("description") or "" for j in jobs_batch], PROMPT_WRITER_BATCH_TOKENS, PROMPT_JOB_MAX_TOKENS)
     jobs_section = ""
-    for i, job in enumerate(jobs_batch):
-        jobs_section += f"\n--- JOB {i+1} ---\nTitle: {job.get('title', 'N/A')}\nCompany: {job.get('company', 'N/A')}\nDescription:\n{(job.get('description') or '')[:1500]}\n"
+    for i, (job, desc) in enumerate(zip(jobs_batch, descs)):
+        jobs_section += f"\n--- JOB {i} ---\nTitle: {job.get('title', 'N/A')}\nCompany: {job.get('company', 'N/A')}\nDescription:\n{desc}\n"
     base = (
         f"You are a senior resume strategist who understands what hiring managers and ATS systems look for.\n\n"
         f"GOAL: For each job below, suggest 2-4 targeted modifications to EXISTING lines in the candidate's resume "
         f"that would make the resume significantly more compelling for that specific role.\n\n"
         f"RULES:\n"
-        f"- You may ONLY modify text that already exists in the resume. Every 'original' phrase MUST come from the resume below.\n"
+        f"- You may ONLY modify text that already exists in the resume. Every 'original' phrase MUST come from the resume above.\n"
         f"- Do NOT copy phrases from the job description as the 'original'. Do NOT invent new bullet points.\n"
         f"- Prioritize changes that close the BIGGEST gaps between the resume and the job requirements.\n"
         f"- Think like the hiring manager: what would make them stop and say 'this person is a fit'?\n\n"
@@ -582,8 +952,7 @@ def _batch_writer_prompt(jobs_batch: List[Dict], resume_text: str, cover_letter_
         f"- Do NOT suggest trivially adding a buzzword. Every change must strengthen the narrative for this role.\n"
         f"- Do NOT suggest changes that would make the resume dishonest or exaggerate beyond what the original implies.\n"
         f"- Do NOT repeat the same suggestion for multiple jobs if they serve different needs.\n\n"
-        f"FORMAT: Start each job's block with exactly ## JOB 1, ## JOB 2, etc. (required for parsing).\n"
-        f"Each suggestion line MUST use this format:\n"
+        f"FORMAT: Each suggestion string MUST use this format:\n"
         f"   [Section: <section name>] Change '<exact or near-exact original from resume>' to '<improved version>' because <reason tied to the specific job requirement it addresses>\n\n"
         f"Example:\n"
         f"   [Section: Work Experience – Acme Corp] Change 'Led cross-functional team on product launches' to "
@@ -593,113 +962,75 @@ def _batch_writer_prompt(jobs_batch: List[Dict], resume_text: str, cover_letter_
         f"=== TARGET JOBS ===\n{jobs_section}\n\n"
     )
     base += (
-        f"=== CANDIDATE RESUME (use ONLY this text for 'original' phrases — read ALL sections including Work Experience, Projects, Education, Activities, Skills) ===\n{resume}\n{cl}\n"
-        f"IMPORTANT: Read the ENTIRE resume top to bottom. Sections near the end (Projects, Activities, Education) often contain "
-        f"highly relevant experience that can be reframed for these roles. Do not skip them."
+        f"IMPORTANT: Use ONLY the CANDIDATE RESUME above for 'original' phrases. Read the ENTIRE resume top to bottom. Sections near the end (Projects, Activities, Education) often contain "
+        f"highly relevant experience that can be reframed for these roles. Do not skip them.\n\n"
+        f"Return ONLY a JSON array: [{{\"idx\": <job index 0-based>, \"suggestions\": [\"[Section: ...] Change '...' to '...' because ...\", ...]}}, ...]. No markdown."
     )
     return base
 
 
 
 
-def _split_batch_suggestions(text: str, count: int) -> List[str]:
-    parts = [""] * count
-    tu = text.upper()
+def _batches(jobs: List[Dict], size: int) -> List[List[Dict]]:
+    """Split jobs into consecutive batches of at most `size` (order preserved)."""
+    return [jobs[i:i + size] for i in range(0, len(jobs), size)]
 
-    def try_markers(markers: List[str]) -> bool:
-        for i, marker in enumerate(markers):
-            start = tu.find(marker.upper())
-            if start == -1:
-                continue
-            start += len(marker)
-            end = tu.find(markers[i + 1].upper()) if i + 1 < len(markers) else len(text)
-            if i + 1 < len(markers) and end == -1:
-                end = len(text)
-            chunk = text[start:end].strip()
-            if len(chunk) > 20:
-                parts[i] = chunk
-        return bool(any(parts))
-
-    # Try ## JOB N and ### JOB N first
-    if try_markers([f"## JOB {i+1}" for i in range(count)]):
-        return parts
-    parts = [""] * count
-    if try_markers([f"### JOB {i+1}" for i in range(count)]):
-        return parts
-    parts = [""] * count
-    # Lenient: JOB 1, Job 1:, **Job 1**, or line starting with "1." "2." etc.
-    for i in range(count):
-        n = i + 1
-        patterns = [
-            f"JOB {n}:",
-            f"JOB {n}\n",
-            f"JOB {n} ",
-            f"**JOB {n}**",
-            f"**Job {n}**",
-            f"Job {n}:",
-            f"Job {n}\n",
-        ]
-        for pat in patterns:
-            start = tu.find(pat.upper())
-            if start != -1:
-                start += len(pat)
-                end = len(text)
-                for j in range(i + 1, count):
-                    next_pat = f"JOB {j+1}"
-                    pos = tu.find(next_pat.upper(), start)
-                    if pos != -1:
-                        end = pos
-                        break
-                chunk = text[start:end].strip()
-                if len(chunk) > 20:
-                    parts[i] = chunk
-                break
-    if any(parts):
-        return parts
-
-    # Fallback: no headers found but text is non-empty
-    stripped = text.strip()
-    if not stripped:
-        return parts
-    if count == 1:
-        parts[0] = stripped
-        return parts
-    # Split by double newline and assign to jobs in order
-    chunks = [c.strip() for c in stripped.split("\n\n") if c.strip()]
-    if not chunks:
-        parts[0] = stripped
-        return parts
-    for i in range(min(count, len(chunks))):
-        if len(chunks[i]) > 20:
-            parts[i] = chunks[i]
-    if len(chunks) > count:
-        parts[count - 1] = "\n\n".join(chunks[count - 1 :])
-    return parts
+
+def _apply_suggestions(batch: List[Dict], item: Any) -> bool:
+    """Store one {"idx", "suggestions"} element on its job; True if a job was updated."""
+    if not isinstance(item, dict):
+        return False
+    idx, suggestions = item.get("idx"), item.get("suggestions")
+    if isinstance(suggestions, list):
+        suggestions = "\n".join(str(x).strip() for x in suggestions if str(x).strip())
+    try:
+        idx = int(idx)
+    except (TypeError, ValueError):
+        return False
+    if not (0 <= idx < len(batch)) or not suggestions:
+        return False
+    batch[idx]["resume_suggestions"] = str(suggestions)
+    return True
 
 
 def resume_modifier_agent_node(state: V3State) -> Dict[str, Any]:
     jobs = state.get("qualifying_jobs") or []
-    resume = state.get("resume") or ""
-    cover = (state.get("cover_letter") or "")
     state["_log_phase"] = 1
-    total_batches = (len(jobs) + BATCH_SIZE - 1) // BATCH_SIZE
-    _log(state, f"Resume Optimizer: starting — {len(jobs)} jobs in {total_batches} batch(es).")
-    for batch_start in range(0, len(jobs), BATCH_SIZE):
-        batch_idx = batch_start // BATCH_SIZE + 1
-        batch = jobs[batch_start:batch_start + BATCH_SIZE]
-        job_range = f"jobs {batch_start + 1}–{batch_start + len(batch)}"
-        _log(state, f"Resume Optimizer: batch {batch_idx}/{total_batches} — generating suggestions for {job_range} (with web search)...")
-        prompt = _batch_writer_prompt(batch, resume, cover)
-        text = _rate_limited_gemini(prompt, use_search_grounding=True)
+    batches = _batches(jobs, BATCH_SIZE)
+    total_batches = len(batches)
+    _log(state, f"Resume Optimizer: starting — {len(jobs)} jobs in {total_batches} batch(es), generating concurrently (with web search)...")
+    _publish_progress(state)
+    prompts = [_batch_writer_prompt(batch) for batch in batches]
+    streams = [_JsonArrayStream() for _ in batches]
+    progress = _ProgressCoalescer(state)
+
+    def on_partial(i: int, text: str) -> None:
+        # Publish each job's suggestions as soon as its array element is complete
+        if any(_apply_suggestions(batches[i], item) for item in streams[i].feed(text)):
+            progress.request()
+
+    texts = generate_text_batch(
+        prompts,
+        use_search_grounding=True,
+        context=profile_context(state),
+        on_partial=on_partial,
+    )
+    progress.flush()
+    job_start = 0
+    for batch_idx, (batch, text) in enumerate(zip(batches, texts), 1):
+        job_range = f"jobs {job_start + 1}–{job_start + len(batch)}"
+        job_start += len(batch)
         if not text.strip():
             for j in batch:
                 j["resume_suggestions"] = "No suggestions generated."
             _log(state, f"Resume Optimizer: batch {batch_idx}/{total_batches} — no output; using fallback.")
             continue
-        parts = _split_batch_suggestions(text, len(batch))
-        for i, j in enumerate(batch):
-            j["resume_suggestions"] = (parts[i] if i < len(parts) and parts[i] else "").strip() or "No suggestions generated."
+        for item in _extract_json_array(text):
+            _apply_suggestions(batch, item)
+        for j in batch:
+            j["resume_suggestions"] = (j.get("resume_suggestions") or "").strip() or "No suggestions generated."
         _log(state, f"Resume Optimizer: batch {batch_idx}/{total_batches} — suggestions generated for {job_range}.")
+    _publish_progress(state)
     _log(state, "Resume Optimizer: all suggestion batches complete.")
     return {"qualifying_jobs": jobs, "_log_phase": 1}
 
@@ -710,16 +1041,13 @@ def resume_modifier_agent_node(state: V3State) -> Dict[str, Any]:
 # Phase 3: Project proposer + future scores
 # ---------------------------------------------------------------------------
 
-def _batch_projects_prompt(jobs: List[Dict], resume_text: str, cover_letter_text: str) -> str:
-    resume = _resume_for_prompt(resume_text or "")
-    cover = _cover_for_prompt(cover_letter_text or "")
-    cl = f"\nCover letter:\n{cover}\n" if cover else ""
+def _batch_projects_prompt(jobs: List[Dict]) -> str:
+    descs = pack_descriptions([j.get("description") or "" for j in jobs], PROMPT_PROJECTS_BATCH_TOKENS, PROMPT_JOB_MAX_TOKENS)
     jobs_section = ""
-    for i, j in enumerate(jobs):
-        desc = (j.get("description") or "")[:1500]
+    for i, (j, desc) in enumerate(zip(jobs, descs)):
         title = j.get("title", "N/A")
         company = j.get("company", "N/A")
-        gaps = (j.get("resume_suggestions") or "")[:800]
+        gaps = truncate_to_tokens(j.get("resume_suggestions") or "", 200)
         jobs_section += f"\n--- JOB {i} ---\nTitle: {title}\nCompany: {company}\nFull description:\n{desc}\nResume improvement suggestions for this role:\n{gaps}\n"
     return (
         f"You are a portfolio strategist who helps candidates build targeted proof-of-work projects that make hiring managers take notice.\n\n"
@@ -744,8 +1072,7 @@ def _batch_projects_prompt(jobs: List[Dict], resume_text: str, cover_letter_text
         f"- Suggest generic projects like 'build a to-do app' or 'create a dashboard'. Every project must be specific to the job's domain.\n"
         f"- Suggest projects that only prove skills the candidate already demonstrates on their resume.\n\n"
         f"=== TARGET JOBS ===\n{jobs_section}\n\n"
-        f"=== CANDIDATE RESUME (read ALL sections including Work Experience, Projects, Education, Activities, Skills) ===\n{resume}\n{cl}\n"
-        f"IMPORTANT: Read the ENTIRE resume. The Projects and Activities sections tell you what the candidate has ALREADY built — do not suggest duplicates.\n\n"
+        f"IMPORTANT: Read the ENTIRE resume above. The Projects and Activities sections tell you what the candidate has ALREADY built — do not suggest duplicates.\n\n"
         f"Return ONLY a JSON array. Each element: {{\"idx\": <job index 0-based>, \"projects\": [{{\"title\": \"...\", \"difficulty\": \"Beginner\"|\"Intermediate\"|\"Advanced\", "
         f"\"estimatedTime\": \"1-2 weeks\", \"brief\": \"One-line summary of what the candidate will build and why it matters for this role.\", "
         f"\"explanation\": \"2-3 sentences: what specific gap this fills, how it relates to the company's domain, and what the deliverable is.\", "
@@ -753,63 +1080,80 @@ def _batch_projects_prompt(jobs: List[Dict], resume_text: str, cover_letter_text
     )
 
 
-def _batch_future_scores_prompt(jobs: List[Dict], resume_text: str, cover_letter_text: str) -> str:
-    resume = _resume_for_prompt(resume_text or "")
-    cover = _cover_for_prompt(cover_letter_text or "")
-    cl = f"\nCover letter:\n{cover}\n" if cover else ""
+def _batch_future_scores_prompt(jobs: List[Dict]) -> str:
     jobs_section = "\n".join(
         f'{{"idx": {i}, "title": "{j.get("title", "N/A")}", "current_score": {j.get("score", 50)}, '
-        f'"resume_improvements": "{(j.get("resume_suggestions") or "")[:100]}", "projects_planned": "{(j.get("project_suggestions") or "")[:100]}"}}'
+        f'"resume_improvements": "{truncate_to_tokens(j.get("resume_suggestions") or "", 25)}", "projects_planned": "{truncate_to_tokens(j.get("project_suggestions") or "", 25)}"}}'
         for i, j in enumerate(jobs)
     )
     return (
         f"Predict NEW match score (0-100) after resume improvements and portfolio projects.\n\n"
         f"Jobs:\n{jobs_section}\n\n"
-        f"=== CANDIDATE RESUME (read ALL sections including Work Experience, Projects, Education, Activities, Skills) ===\n{resume}\n{cl}\n"
         f"IMPORTANT: Consider ALL sections of the resume above.\n\n"
-        f"Return ONLY a JSON array: [{{\"idx\": 0, \"future_score\": 92}}, ...]. No markdown."
+        f"Return a JSON array with one {{\"idx\", \"future_score\"}} object per job."
     )
 
 
+def _apply_projects(batch: List[Dict], item: Any) -> bool:
+    """Store one {"idx", "projects"} element on its job; True if a job was updated."""
+    if not isinstance(item, dict):
+        return False
+    try:
+        idx = int(item.get("idx"))
+    except (TypeError, ValueError):
+        return False
+    if not (0 <= idx < len(batch)):
+        return False
+    projects = item.get("projects", [])
+    batch[idx]["project_suggestions"] = json.dumps(projects) if isinstance(projects, list) else str(projects)
+    return True
+
+
 def project_proposer_node(state: V3State) -> Dict[str, Any]:
     jobs = state.get("qualifying_jobs") or []
-    resume = state.get("resume") or ""
-    cover = state.get("cover_letter") or ""
     state["_log_phase"] = 2
-    total_batches = (len(jobs) + BATCH_SIZE - 1) // BATCH_SIZE
-    _log(state, f"Project Ideas: starting — {len(jobs)} jobs in {total_batches} batch(es) (with web search).")
+    batches = _batches(jobs, BATCH_SIZE)
+    total_batches = len(batches)
+    _log(state, f"Project Ideas: starting — {len(jobs)} jobs in {total_batches} batch(es), generating concurrently (with web search).")
     for j in jobs:
         j.setdefault("project_suggestions", "No project suggestions generated.")
-    for batch_start in range(0, len(jobs), BATCH_SIZE):
-        batch_idx = batch_start // BATCH_SIZE + 1
-        batch = jobs[batch_start : batch_start + BATCH_SIZE]
-        job_range = f"jobs {batch_start + 1}–{batch_start + len(batch)}"
-        _log(state, f"Project Ideas: batch {batch_idx}/{total_batches} — generating project ideas for {job_range} (with web search)...")
-        prompt = _batch_projects_prompt(batch, resume, cover)
-        text = _rate_limited_gemini(prompt, use_search_grounding=True)
+    prompts = [_batch_projects_prompt(batch) for batch in batches]
+    streams = [_JsonArrayStream() for _ in batches]
+
+    progress = _ProgressCoalescer(state)
+
+    def on_partial(i: int, text: str) -> None:
+        if any(_apply_projects(batches[i], item) for item in streams[i].feed(text)):
+            progress.request()
+
+    texts = generate_text_batch(
+        prompts,
+        use_search_grounding=True,
+        context=profile_context(state),
+        on_partial=on_partial,
+    )
+    progress.flush()
+    job_start = 0
+    for batch_idx, (batch, text) in enumerate(zip(batches, texts), 1):
+        job_range = f"jobs {job_start + 1}–{job_start + len(batch)}"
+        job_start += len(batch)
         if text.strip():
-            try:
-                items = _extract_json_array(text)
-                for item in items:
-                    idx = item.get("idx")
-                    projects = item.get("projects", [])
-                    if idx is not None and 0 <= int(idx) < len(batch):
-                        batch[int(idx)]["project_suggestions"] = json.dumps(projects) if isinstance(projects, list) else str(projects)
-            except (json.JSONDecodeError, ValueError, TypeError) as e:
-                err_preview = str(e)[:80]
-                _log(state, f"Project Ideas: batch {batch_idx}/{total_batches} — could not parse model output ({err_preview}); keeping defaults.")
+            items = _extract_json_array(text)
+            if not items:
+                _log(state, f"Project Ideas: batch {batch_idx}/{total_batches} — could not parse model output; keeping defaults.")
+            for item in items:
+                _apply_projects(batch, item)
         _log(state, f"Project Ideas: batch {batch_idx}/{total_batches} — done for {job_range}.")
     _log(state, "Project Ideas: all batches complete.")
+    _publish_progress(state)
     return {"qualifying_jobs": jobs, "_log_phase": 2}
 
 
 def future_scores_node(state: V3State) -> Dict[str, Any]:
     jobs = state.get("qualifying_jobs") or []
-    resume = state.get("resume") or ""
-    cover = state.get("cover_letter") or ""
     _log(state, "Predicting future scores...")
-    prompt = _batch_future_scores_prompt(jobs, resume, cover)
-    text = _rate_limited_gemini(prompt)
+    prompt = _batch_future_scores_prompt(jobs)
+    text = _rate_limited_gemini(prompt, context=profile_context(state), response_schema=FUTURE_SCORES_SCHEMA)
     for j in jobs:
         cur = j.get("score", 50)
         j.setdefault("future_score", min(100, cur + 10))
@@ -822,7 +1166,6 @@ def future_scores_node(state: V3State) -> Dict[str, Any]:
                 j = jobs[int(idx)]
                 j["future_score"] = max(0, min(100, int(fs)))
                 j["improvement_potential"] = j["future_score"] - j.get("score", 50)
-    update_relevant_jobs(jobs)
     _log(state, f"Future scores done — {len(jobs)} jobs.")
     return {"qualifying_jobs": jobs}
 
@@ -833,13 +1176,10 @@ def future_scores_node(state: V3State) -> Dict[str, Any]:
 
 RELEVANCE_BATCH_SIZE = 6
 
-def _batch_relevance_summary_prompt(jobs_batch: List[Dict], resume_text: str, cover_letter_text: str) -> str:
-    resume = _resume_for_prompt(resume_text or "")
-    cover = _cover_for_prompt(cover_letter_text or "")
-    cl = f"\nCover letter:\n{cover}\n" if cover else ""
+def _batch_relevance_summary_prompt(jobs_batch: List[Dict]) -> str:
+    descs = pack_descriptions([j.get("description") or "" for j in jobs_batch], PROMPT_RELEVANCE_BATCH_TOKENS, PROMPT_JOB_MAX_TOKENS)
     jobs_block = ""
-    for i, job in enumerate(jobs_batch):
-        desc = (job.get("description") or "")[:800]
+    for i, (job, desc) in enumerate(zip(jobs_batch, descs)):
         title = job.get("title", "N/A")
         company = job.get("company", "N/A")
         score = job.get("score", 50)
@@ -847,44 +1187,69 @@ def _batch_relevance_summary_prompt(jobs_batch: List[Dict], resume_text: str, co
     return (
         f"You are a hiring manager. For each job, compare the candidate's resume to the role requirements and write a brief assessment.\n\n"
         f"=== JOBS ===\n{jobs_block}\n\n"
-        f"=== CANDIDATE RESUME ===\n{resume}\n{cl}\n"
-        f"Read the ENTIRE resume including Projects, Activities, and Skills sections.\n\n"
+        f"Read the ENTIRE resume above including Projects, Activities, and Skills sections.\n\n"
         f"For each job return:\n"
         f"- working: 1 sentence — the strongest match between the candidate's background and this role. Cite a specific experience or skill.\n"
         f"- not_working: 1 sentence — the single most important qualification this role requires that the candidate lacks evidence of. "
         f"Focus on real gaps only (missing domain experience, required skill not demonstrated anywhere, seniority level, certification). "
         f"Do NOT restate the job description. Do NOT flag things the candidate has.\n\n"
-        f"Return ONLY a JSON array: [{{\"idx\": 0, \"working\": \"...\", \"not_working\": \"...\"}}, ...]. No markdown."
+        f"Return a JSON array with one {{\"idx\", \"working\", \"not_working\"}} object per job."
     )
 
 
 def relevance_summary_node(state: V3State) -> Dict[str, Any]:
+    """
+    Runs as a parallel branch next to the resume modifier / project proposer chain.
+    Only reads title, description and score, and returns summaries aligned with
+    qualifying_jobs instead of mutating them; merge_results_node applies them.
+    """
     jobs = state.get("qualifying_jobs") or []
-    resume = state.get("resume") or ""
-    cover = state.get("cover_letter") or ""
-    total_batches = (len(jobs) + RELEVANCE_BATCH_SIZE - 1) // RELEVANCE_BATCH_SIZE
-    _log(state, f"Writing relevance summaries — {len(jobs)} jobs in {total_batches} batch(es)...")
-    for batch_start in range(0, len(jobs), RELEVANCE_BATCH_SIZE):
-        batch = jobs[batch_start : batch_start + RELEVANCE_BATCH_SIZE]
-        batch_idx = batch_start // RELEVANCE_BATCH_SIZE + 1
-        _log(state, f"Relevance summary: batch {batch_idx}/{total_batches}...")
-        prompt = _batch_relevance_summary_prompt(batch, resume, cover)
-        text = _rate_limited_gemini(prompt)
+    state["_log_phase"] = 1
+    summaries = [""] * len(jobs)
+    batches = _batches(jobs, RELEVANCE_BATCH_SIZE)
+    total_batches = len(batches)
+    _log(state, f"Writing relevance summaries — {len(jobs)} jobs in {total_batches} batch(es), concurrently...")
+    prompts = [_batch_relevance_summary_prompt(batch) for batch in batches]
+    texts = generate_text_batch(
+        prompts,
+        context=profile_context(state),
+        response_schema=RELEVANCE_SCHEMA,
+    )
+    # Logged here, on the run's thread: the job log writes to the job store
+    for batch_idx, text in enumerate(texts):
         if not text.strip():
+            _log(state, f"Relevance summary: batch {batch_idx + 1}/{total_batches} — no output.")
             continue
+        _log(state, f"Relevance summary: batch {batch_idx + 1}/{total_batches} received.")
+        offset = batch_idx * RELEVANCE_BATCH_SIZE
+        batch_len = len(batches[batch_idx])
         for item in _extract_json_array(text):
             idx = item.get("idx")
             working = (item.get("working") or "").strip()
             not_working = (item.get("not_working") or "").strip()
-            if idx is not None and 0 <= int(idx) < len(batch):
-                j = batch[int(idx)]
+            if idx is not None and 0 <= int(idx) < batch_len:
                 parts = []
                 if working:
                     parts.append(f"**What is working:** {working}")
                 if not_working:
                     parts.append(f"**What is not working:** {not_working}")
-                j["brief_relevance_summary"] = "\n\n".join(parts) if parts else ""
+                summaries[offset + int(idx)] = "\n\n".join(parts) if parts else ""
     _log(state, f"Relevance summaries done for {len(jobs)} jobs.")
+    return {"relevance_summaries": summaries}
+
+
+# ---------------------------------------------------------------------------
+# Join: merge parallel branch outputs
+# ---------------------------------------------------------------------------
+
+def merge_results_node(state: V3State) -> Dict[str, Any]:
+    jobs = state.get("qualifying_jobs") or []
+    summaries = state.get("relevance_summaries") or []
+    for j, summary in zip(jobs, summaries):
+        if summary:
+            j["brief_relevance_summary"] = summary
+    _publish_progress(state)
+    update_relevant_jobs(jobs)
     return {"qualifying_jobs": jobs}
 
 
@@ -893,6 +1258,10 @@ def relevance_summary_node(state: V3State) -> Dict[str, Any]:
 # ---------------------------------------------------------------------------
 
 def build_v3_workflow():
+    # Imported here, not at module top: langgraph is the heaviest import in the workflow
+    # and only needed once a run starts (keeps API cold starts fast)
+    from langgraph.graph import END, StateGraph
+
     workflow = StateGraph(V3State)
 
     workflow.add_node("decide_titles", decide_titles_node)
@@ -903,21 +1272,29 @@ def build_v3_workflow():
     workflow.add_node("project_proposer", project_proposer_node)
     workflow.add_node("future_scores", future_scores_node)
     workflow.add_node("relevance_summary", relevance_summary_node)
+    workflow.add_node("merge_results", merge_results_node)
 
     workflow.set_entry_point("decide_titles")
     workflow.add_edge("decide_titles", "phase1_agent")
     workflow.add_conditional_edges(
         "phase1_agent",
         phase1_route,
-        {"phase1_tools": "phase1_tools", "resume_modifier_agent": "resume_modifier_agent", "phase1_agent": "phase1_agent"},
+        {
+            "phase1_tools": "phase1_tools",
+            "phase1_agent": "phase1_agent",
+            "resume_modifier_agent": "resume_modifier_agent",
+            "relevance_summary": "relevance_summary",
+        },
     )
     workflow.add_edge("phase1_tools", "score_batch")
     workflow.add_edge("score_batch", "phase1_agent")
 
+    # Fan-out: resume_modifier_agent -> project_proposer -> future_scores runs alongside relevance_summary
     workflow.add_edge("resume_modifier_agent", "project_proposer")
-
     workflow.add_edge("project_proposer", "future_scores")
-    workflow.add_edge("future_scores", "relevance_summary")
-    workflow.add_edge("relevance_summary", END)
+
+    # Fan-in: wait for both branches before writing results
+    workflow.add_edge(["future_scores", "relevance_summary"], "merge_results")
+    workflow.add_edge("merge_results", END)
 
     return workflow.compile()
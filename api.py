@@ -3,24 +3,94 @@ JobLens FastAPI Server
 Wraps the LangGraph workflow with async execution and per-step progress tracking.
 
 Endpoints:
-  POST /analyze         — upload resume + titles, starts background job
-  GET  /status/{job_id} — poll step-by-step progress
+  POST /analyze         — upload resume + titles, queues a background run (429 when the queue is full)
+  GET  /status/{job_id} — poll step-by-step progress (?since=N returns only newer events)
+  GET  /events/{job_id} — Server-Sent Events stream of step transitions and log lines
   GET  /results/{job_id}— retrieve final mapped JobListing array
+                          (?partial=true returns jobs filled in so far while running)
+  GET  /metrics         — upload extraction latency per format, text cache hits, run queue stats
 """
 
+import asyncio
 import json
 import threading
 import traceback
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from tools.text_extractor import extract_text
+from config import EXTRACT_MAX_BYTES, EXTRACT_TIMEOUT_SECONDS, RUN_DRAIN_TIMEOUT_SECONDS, RUN_QUEUE_MAX, RUN_WORKERS
+from tools.extraction_pool import ExtractionTimeout, extract_text_async, extraction_metrics, shutdown_extraction_pool
+from tools.job_store import get_job_store
+from tools.run_scheduler import QueueFull, RunScheduler
+from tools.text_extractor import extraction_cache_stats
+from tools.upload_spool import FileTooLarge, read_upload
 
 app = FastAPI(title="JobLens API")
 
+# Resume + cover letter, each capped at EXTRACT_MAX_BYTES, plus room for the form fields
+ANALYZE_MAX_BODY_BYTES = 2 * EXTRACT_MAX_BYTES + 64 * 1024
+
+
+def _body_too_large() -> JSONResponse:
+    return JSONResponse(
+        status_code=413,
+        content={"detail": f"Upload is too large (limit {EXTRACT_MAX_BYTES // (1024 * 1024)} MB per file)."},
+    )
+
+
+class _LimitAnalyzeBody:
+    """
+    ASGI middleware capping the /analyze request body at ANALYZE_MAX_BODY_BYTES.
+    A larger Content-Length is refused before anything is read. Bodies without one (chunked)
+    are counted as they arrive: past the cap the client gets the same 413 and the app sees a
+    disconnect, so Starlette stops spooling the multipart files.
+    Added before CORS so CORS stays outermost and the 413 carries its headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/analyze":
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length", b"").decode()
+        if length.isdigit() and int(length) > ANALYZE_MAX_BODY_BYTES:
+            await _body_too_large()(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > ANALYZE_MAX_BODY_BYTES:
+                    rejected = True
+                    await _body_too_large()(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:  # after the 413, the app's own reply is dropped
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise  # parsing gave up on the simulated disconnect; the 413 is already sent
+
+
+app.add_middleware(_LimitAnalyzeBody)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,11 +99,11 @@ app.add_middleware(
 )
 
 # ---------------------------------------------------------------------------
-# In-memory job store
-# {job_id: {status, steps, results, error}}
+# Job store (memory or SQLite, see tools/job_store.py)
+# {job_id: {status, steps, results, partial_results, error}} plus sequenced events
 # ---------------------------------------------------------------------------
 
-jobs_store: Dict[str, dict] = {}
+jobs_store = get_job_store()
 
 STEP_DEFINITIONS = [
     {"id": "1", "name": "Job Acquisition Agent",
@@ -52,21 +122,83 @@ def _init_steps() -> List[dict]:
     ]
 
 
+# ---------------------------------------------------------------------------
+# Progress events
+# Every step transition / log line is also stored as an event with a sequence
+# number, so clients can fetch deltas (/status?since=) or have them pushed
+# (/events SSE) instead of re-reading all steps.
+# ---------------------------------------------------------------------------
+
+SSE_KEEPALIVE_SECONDS = 15
+
+_waiters_lock = threading.Lock()
+# job_id -> [(event loop, asyncio.Event)] of SSE streams connected to this process
+_event_waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+
+def _mutate(job_id: str, fn) -> Optional[dict]:
+    """Apply fn to the run in the store; wake this process's SSE streams if it produced an event."""
+    event = jobs_store.mutate(job_id, fn)
+    if event is None:
+        return None
+    with _waiters_lock:
+        waiters = list(_event_waiters.get(job_id, ()))
+    for loop, ready in waiters:
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:
+            pass  # loop already closed; the stream is gone
+    return event
+
+
 def _set_step(job_id: str, idx: int, status: str, duration: Optional[str] = None):
     """Update a single step's status in the store."""
-    if job_id not in jobs_store:
-        return
-    step = jobs_store[job_id]["steps"][idx]
-    step["status"] = status
-    if duration:
-        step["duration"] = duration
+    def apply(entry):
+        step = entry["steps"][idx]
+        if step["status"] == status and (not duration or step["duration"] == duration):
+            return None
+        step["status"] = status
+        if duration:
+            step["duration"] = duration
+        return {"type": "step", "step": idx, "status": status, "duration": step["duration"]}
+    _mutate(job_id, apply)
 
 
 def _add_step_log(job_id: str, step_idx: int, message: str):
     """Append a log entry to a specific step, visible inline in the timeline."""
-    if job_id not in jobs_store:
-        return
-    jobs_store[job_id]["steps"][step_idx]["logs"].append(message)
+    def apply(entry):
+        entry["steps"][step_idx]["logs"].append(message)
+        return {"type": "log", "step": step_idx, "message": message}
+    _mutate(job_id, apply)
+
+
+def _set_status(job_id: str, status: str, error: Optional[str] = None, results: Optional[List[dict]] = None):
+    """Set the job's overall status (queued / running / completed / error), and its results, and emit it as an event."""
+    def apply(entry):
+        entry["status"] = status
+        if status != "queued":
+            entry["queue_position"] = None
+        if error is not None:
+            entry["error"] = error
+        if results is not None:
+            entry["results"] = results
+        return {"type": "status", "status": status, "error": entry.get("error")}
+    _mutate(job_id, apply)
+
+
+def _publish_queue_positions(positions: Dict[str, int]):
+    """Scheduler hook: record each waiting run's queue position (and push it to SSE clients)."""
+    for job_id, position in positions.items():
+        def apply(entry, position=position):
+            if entry.get("status") != "queued" or entry.get("queue_position") == position:
+                return None
+            entry["queue_position"] = position
+            return {"type": "queue", "position": position}
+        _mutate(job_id, apply)
+
+
+# Bounded pool for workflow runs; /analyze queues into it instead of spawning a thread per upload
+scheduler = RunScheduler(RUN_WORKERS, RUN_QUEUE_MAX, on_queue_change=_publish_queue_positions)
 
 
 # ---------------------------------------------------------------------------
@@ -275,19 +407,30 @@ def _run_workflow(
     Phase 3 (project proposer + future scores + relevance summary).
     """
     try:
-        from agents.v3_graph import build_v3_workflow
+        _set_status(job_id, "running")
+        from agents.v3_graph import build_v3_workflow, profile_context
         from agents.state import V3State
 
         _last_phase = [0]
 
         def log_cb(state, msg):
             step_idx = state.get("_log_phase", 0)
-            if step_idx != _last_phase[0]:
+            # Parallel branches may log for an earlier step; never move the timeline backwards.
+            if step_idx > _last_phase[0]:
                 _set_step(job_id, _last_phase[0], "completed")
                 _set_step(job_id, step_idx, "running")
                 _last_phase[0] = step_idx
             _add_step_log(job_id, step_idx, msg)
 
+        def progress_cb(jobs):
+            # Called as each job's suggestions / projects stream in
+            partial = [_map_job(job, i + 1) for i, job in enumerate(list(jobs))]
+
+            def apply(entry):
+                entry["partial_results"] = partial
+                return {"type": "results", "count": len(partial)}
+            _mutate(job_id, apply)
+
         initial_state: V3State = {
             "resume": resume_text,
             "cover_letter": cover_letter_text,
@@ -303,16 +446,25 @@ def _run_workflow(
             "last_tried_page": -1,
             "phase1_tried_pairs": [],
             "phase1_rounds": 0,
+            "prefilter_stats": {"scored": 0, "pruned": 0, "tokens_saved": 0},
             "phase2_rounds": 0,
+            "relevance_summaries": [],
             "_log": log_cb,
             "_log_phase": 0,
+            "_on_progress": progress_cb,
         }
 
         _set_step(job_id, 0, "running")
         t0 = _time.time()
 
         app = build_v3_workflow()
-        final_state = app.invoke(initial_state)
+        profile = profile_context(initial_state)
+        profile.retain()
+        try:
+            final_state = app.invoke(initial_state)
+        finally:
+            # Delete the run's cached profile now rather than paying for it until the TTL
+            profile.release()
 
         for idx in range(3):
             _set_step(job_id, idx, "completed", f"{_time.time()-t0:.1f}s" if idx == 0 else None)
@@ -320,11 +472,9 @@ def _run_workflow(
         qualifying_jobs = final_state.get("qualifying_jobs") or []
         qualifying_jobs.sort(key=lambda x: x.get("improvement_potential", 0), reverse=True)
 
-        jobs_store[job_id]["results"] = [
-            _map_job(job, i + 1) for i, job in enumerate(qualifying_jobs)
-        ]
-        jobs_store[job_id]["status"] = "completed"
+        results = [_map_job(job, i + 1) for i, job in enumerate(qualifying_jobs)]
         _add_step_log(job_id, 2, f"Done! {len(qualifying_jobs)} jobs ready for review.")
+        _set_status(job_id, "completed", results=results)
 
     except Exception as exc:
         err_msg = f"Workflow error: {exc}"
@@ -333,14 +483,12 @@ def _run_workflow(
         import sys
         sys.stdout.flush()
         sys.stderr.flush()
-        for step in jobs_store.get(job_id, {}).get("steps", []):
+        entry = jobs_store.get(job_id) or {}
+        for idx, step in enumerate(entry.get("steps", [])):
             if step.get("status") == "running":
-                idx = jobs_store[job_id]["steps"].index(step)
                 _add_step_log(job_id, idx, f"ERROR: {err_msg}")
-                step["status"] = "error"
-        if job_id in jobs_store:
-            jobs_store[job_id]["status"] = "error"
-            jobs_store[job_id]["error"] = str(exc)
+                _set_step(job_id, idx, "error")
+        _set_status(job_id, "error", str(exc))
 
 
 # ---------------------------------------------------------------------------
@@ -356,35 +504,41 @@ async def analyze(
 ):
     """
     Accept resume + optional cover letter upload.
-    Starts the workflow in a background thread and returns a job_id.
+    Queues the workflow on the run scheduler and returns a job_id (429 + Retry-After
+    when the queue is full).
     """
     print(f"[API] POST /analyze received", flush=True)
+    if scheduler.is_full():
+        # Refuse before spending time on text extraction
+        raise _busy(scheduler.retry_after())
+    # Resume and cover letter are read and extracted concurrently under one shared deadline
+    deadline = asyncio.get_running_loop().time() + EXTRACT_TIMEOUT_SECONDS
+    resume_filename = resume.filename or "resume.pdf"
+    resume_task = asyncio.ensure_future(_read_and_extract(resume, resume_filename, "Resume", deadline))
+    cl_task = None
+    if cover_letter is not None and cover_letter.filename:
+        cl_task = asyncio.ensure_future(_read_cover_letter(cover_letter, deadline))
+
+    resume_text: Optional[str] = None
     try:
-        resume_bytes = await resume.read()
-        if not resume_bytes:
+        resume_text = await resume_task
+        if resume_text is None:
             raise HTTPException(status_code=400, detail="Resume file is empty.")
-        resume_filename = resume.filename or "resume.pdf"
-        print(f"[API] Resume received: {resume_filename} ({len(resume_bytes):,} bytes)", flush=True)
-        resume_text = extract_text(resume_bytes, resume_filename)
-        print(f"[API] Resume text extracted: {len(resume_text):,} chars", flush=True)
     except HTTPException:
         raise
+    except FileTooLarge as exc:
+        raise HTTPException(status_code=413, detail=f"Resume is too large: {exc}")
+    except ExtractionTimeout as exc:
+        raise HTTPException(status_code=400, detail=f"Could not extract text from resume: {exc}")
     except Exception as exc:
         print(f"[API] Resume extraction error: {exc}", flush=True)
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Could not extract text from resume: {exc}")
+    finally:
+        if resume_text is None and cl_task is not None:
+            cl_task.cancel()  # no run without a resume; stop the cover letter's work too
 
-    cover_letter_text = ""
-    if cover_letter is not None:
-        try:
-            cl_filename = cover_letter.filename or ""
-            if cl_filename:
-                cl_bytes = await cover_letter.read()
-                if cl_bytes:
-                    cover_letter_text = extract_text(cl_bytes, cl_filename)
-                    print(f"[API] Cover letter extracted: {len(cover_letter_text):,} chars", flush=True)
-        except Exception as exc:
-            print(f"[API] Cover letter extraction error (ignoring): {exc}", flush=True)
+    cover_letter_text = await cl_task if cl_task is not None else ""
 
     try:
         desired_titles: List[str] = json.loads(job_titles)
@@ -394,47 +548,193 @@ async def analyze(
     job_type_val = job_type if job_type in ("full_time", "internship", "both") else "full_time"
 
     job_id = str(uuid.uuid4())
-    jobs_store[job_id] = {
-        "status": "running",
+    try:
+        # Store writes (SQLite) and the queue-position hook run off the event loop
+        position = await asyncio.to_thread(
+            _queue_run, job_id, resume_text, cover_letter_text, desired_titles, job_type_val
+        )
+    except QueueFull as exc:
+        raise _busy(exc.retry_after)
+
+    return {"job_id": job_id, "queue_position": position}
+
+
+def _queue_run(job_id: str, *args) -> int:
+    """Create the run's entry and submit it; the entry is removed again if the queue refuses it."""
+    jobs_store.put(job_id, {
+        "status": "queued",
+        "queue_position": None,
         "steps": _init_steps(),
         "results": None,
+        "partial_results": None,
         "error": None,
-    }
+    })
+    try:
+        return scheduler.submit(job_id, _run_workflow, job_id, *args)
+    except QueueFull:
+        jobs_store.delete(job_id)
+        raise
 
-    thread = threading.Thread(
-        target=_run_workflow,
-        args=(job_id, resume_text, cover_letter_text, desired_titles, job_type_val),
-        daemon=True,
-    )
-    thread.start()
 
-    return {"job_id": job_id}
+async def _read_and_extract(upload: UploadFile, filename: str, label: str, deadline: float) -> Optional[str]:
+    """Extract an upload's text before the loop-time deadline. None if the file is empty."""
+    spooled = await read_upload(upload)
+    try:
+        if not spooled.size:
+            return None
+        print(f"[API] {label} received: {filename} ({spooled.size:,} bytes)", flush=True)
+        remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+        text = await extract_text_async(spooled, filename, timeout=remaining)
+        print(f"[API] {label} text extracted: {len(text):,} chars", flush=True)
+        return text
+    finally:
+        spooled.close()
+
+
+async def _read_cover_letter(upload: UploadFile, deadline: float) -> str:
+    """Cover letter text, or "" when it is empty or cannot be extracted (it is optional)."""
+    try:
+        return await _read_and_extract(upload, upload.filename, "Cover letter", deadline) or ""
+    except Exception as exc:
+        print(f"[API] Cover letter extraction error (ignoring): {exc}", flush=True)
+        return ""
+
+
+def _busy(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many analyses are queued. Please try again shortly.",
+        headers={"Retry-After": str(retry_after)},
+    )
 
 
 @app.get("/status/{job_id}")
-def get_status(job_id: str):
-    """Return current status and step-by-step progress for a job."""
+def get_status(job_id: str, since: Optional[int] = None):
+    """
+    Return current status and step-by-step progress for a job.
+    With ?since=N, return only the events after sequence N (plus the new cursor)
+    instead of the full steps list.
+    """
     entry = jobs_store.get(job_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Job not found")
+    if since is not None:
+        events = jobs_store.events_since(job_id, since)
+        return {
+            "status": entry["status"],
+            "queue_position": entry.get("queue_position"),
+            "error": entry.get("error"),
+            "cursor": events[-1]["seq"] if events else max(0, since),
+            "events": events,
+        }
     return {
         "status": entry["status"],
+        "queue_position": entry.get("queue_position"),
         "steps": entry["steps"],
         "error": entry.get("error"),
     }
 
 
+@app.get("/events/{job_id}")
+async def stream_events(job_id: str, request: Request, since: int = 0):
+    """
+    Server-Sent Events stream of the job's progress events (step, log, results, queue, status).
+    Resumes after ?since=N or the Last-Event-ID header; closes once the job has finished
+    and every event has been sent.
+    """
+    entry = jobs_store.get(job_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = max(since, int(last_event_id))
+
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    # Events written by other worker processes don't wake us; re-check on the store's poll interval
+    wait_seconds = min(SSE_KEEPALIVE_SECONDS, jobs_store.poll_interval or SSE_KEEPALIVE_SECONDS)
+
+    async def event_source():
+        cursor = since
+        last_sent = _time.monotonic()
+        with _waiters_lock:
+            _event_waiters.setdefault(job_id, []).append((loop, ready))
+        try:
+            while True:
+                ready.clear()
+                current = jobs_store.get(job_id)
+                for event in jobs_store.events_since(job_id, cursor):
+                    cursor = event["seq"]
+                    last_sent = _time.monotonic()
+                    yield f"id: {cursor}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                # Status was read before draining, so its final "status" event has been sent
+                if current is None or current["status"] in ("completed", "error"):
+                    break
+                if await request.is_disconnected():
+                    break
+                try:
+                    await asyncio.wait_for(ready.wait(), timeout=wait_seconds)
+                except asyncio.TimeoutError:
+                    if _time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                        last_sent = _time.monotonic()
+                        yield ": keep-alive\n\n"
+        finally:
+            with _waiters_lock:
+                waiters = _event_waiters.get(job_id, [])
+                if (loop, ready) in waiters:
+                    waiters.remove((loop, ready))
+                if not waiters:
+                    _event_waiters.pop(job_id, None)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        # no-transform: proxies must not compress (and so buffer) the stream
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/results/{job_id}")
-def get_results(job_id: str):
-    """Return the final mapped JobListing array once the workflow is complete."""
+def get_results(job_id: str, partial: bool = False):
+    """
+    Return the final mapped JobListing array once the workflow is complete.
+    With ?partial=true, a running job returns the jobs filled in so far instead of 202.
+    """
     entry = jobs_store.get(job_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Job not found")
     if entry["status"] != "completed":
+        if partial:
+            return {"jobs": entry.get("partial_results") or [], "partial": True}
         raise HTTPException(status_code=202, detail="Workflow not yet complete")
     return {"jobs": entry["results"] or []}
 
 
+@app.on_event("shutdown")
+def _drain_runs():
+    """Stop admitting runs and let queued / running ones finish (up to RUN_DRAIN_TIMEOUT_SECONDS)."""
+    print(f"[API] Shutting down: draining run queue ({scheduler.stats()})", flush=True)
+    for job_id in scheduler.shutdown(timeout=RUN_DRAIN_TIMEOUT_SECONDS):
+        _set_status(job_id, "error", "Server shut down before this analysis started. Please try again.")
+    for job_id in scheduler.running_jobs():
+        _set_status(job_id, "error", "Server shut down during this analysis. Please try again.")
+
+
+@app.on_event("shutdown")
+def _stop_extraction_pool():
+    shutdown_extraction_pool()
+
+
+@app.get("/metrics")
+def metrics():
+    """Upload extraction latency per format, extracted-text cache hits and run scheduler occupancy."""
+    return {
+        "extraction": extraction_metrics(),
+        "extraction_cache": extraction_cache_stats(),
+        "runs": scheduler.stats(),
+    }
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
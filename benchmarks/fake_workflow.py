@@ -0,0 +1,215 @@
+"""
+Fake Workflow Check
+Purpose: Run the full v3 workflow offline and check that the candidate profile is uploaded
+once as cached content, reused by every stage, deleted when the run ends, and that caching
+actually lowers the prompt tokens sent compared with inlining the profile.
+Uses: GEMINI_BACKEND=fake (tools.llm_gateway.FakeGeminiClient) with a responder that returns
+well-formed JSON for each stage, and synthetic LinkedIn postings in place of JobSpy. Each
+mode runs in a fresh interpreter inside its own temporary directory (cache and the
+data/ output alike), so nothing is shared and the repo is left untouched.
+Run:  python benchmarks/fake_workflow.py
+Exit status is 1 if a check fails.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from typing import Any, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Large enough to pass GEMINI_CONTEXT_CACHE_MIN_TOKENS, so the cached mode really caches
+_RESUME = "\n".join(
+    f"- Built Python data pipeline {i} with SQL, Airflow and AWS; cut reporting latency by {i % 40 + 10}%."
+    for i in range(500)
+)
+_COVER_LETTER = "I am applying for data engineering roles where I can own Python and SQL pipelines end to end."
+_TITLES = ["Data Engineer", "Analytics Engineer"]
+
+
+# ---------------------------------------------------------------------------
+# Child: one workflow run on the fake backend
+# ---------------------------------------------------------------------------
+
+def _stage(contents: Any) -> str:
+    """Which workflow stage a prompt belongs to, from the output format it asks for."""
+    text = str(contents)
+    for marker, stage in (
+        ("suggest job titles", "titles"),
+        ('"score"} object', "scores"),
+        ('"suggestions"', "resume_suggestions"),
+        ('"projects"', "projects"),
+        ('"future_score"', "future_scores"),
+        ('"working"', "relevance"),
+    ):
+        if marker in text:
+            return stage
+    return "other"
+
+
+def _respond(model: str, contents: Any, config: Any) -> str:
+    stage = _stage(contents)
+    idxs = [int(i) for i in re.findall(r'"idx": (\d+)', str(contents))] or list(range(10))
+    if stage == "titles":
+        return json.dumps(_TITLES)
+    if stage == "scores":
+        # Every other posting qualifies (threshold 85), i.e. about 5 per page of 10
+        return json.dumps([{"idx": i, "score": 92 if i % 2 == 0 else 40} for i in idxs])
+    if stage == "resume_suggestions":
+        return json.dumps([{"idx": i, "suggestions": ["[Section: Experience] Change 'Built' to 'Designed' because scope"]}
+                           for i in range(3)])
+    if stage == "projects":
+        return json.dumps([{"idx": i, "projects": [{"title": "Streaming ETL", "difficulty": "Intermediate"}]}
+                           for i in range(3)])
+    if stage == "future_scores":
+        return json.dumps([{"idx": i, "future_score": 95} for i in idxs])
+    if stage == "relevance":
+        return json.dumps([{"idx": i, "working": "Python and SQL", "not_working": "No Spark"} for i in idxs])
+    return "[]"
+
+
+def _fake_postings(job_titles=None, max_jobs: int = 5, start_offset: int = 0, **_: Any) -> List[Dict]:
+    title = (job_titles or ["Software Engineer"])[0]
+    return [
+        {
+            "title": f"{title} {i}",
+            "company": f"Company {i}",
+            "location": "Remote",
+            "description": f"{title} role: build Python and SQL data pipelines on AWS with Airflow. Posting {i}.",
+            "url": f"https://www.linkedin.com/jobs/view/{title.lower().replace(' ', '-')}-{i}",
+            "source": "linkedin",
+        }
+        for i in range(start_offset, start_offset + max_jobs)
+    ]
+
+
+def _child() -> Dict[str, Any]:
+    sys.path.insert(0, REPO_ROOT)
+    from agents import v3_graph
+    from tools import llm_gateway
+
+    fake = llm_gateway.get_client()
+    assert isinstance(fake, llm_gateway.FakeGeminiClient), "GEMINI_BACKEND=fake did not select the fake client"
+    fake.responder = _respond
+    v3_graph.scrape_jobs = _fake_postings
+
+    state = {
+        "resume": _RESUME,
+        "cover_letter": _COVER_LETTER,
+        "job_type": "full_time",
+        "suggested_titles": [],
+        "qualifying_jobs": [],
+        "seen_urls": [],
+        "current_batch": [],
+        "phase1_tried_pairs": [],
+        "phase1_rounds": 0,
+        "relevance_summaries": [],
+        "_log": lambda state, msg: None,
+    }
+    # Same bracketing as api._run_workflow
+    profile = v3_graph.profile_context(state)
+    profile.retain()
+    try:
+        final = v3_graph.build_v3_workflow().invoke(state)
+    finally:
+        profile.release()
+
+    cached_refs = Counter(
+        c["config"].get("cached_content") for c in fake.calls
+        if isinstance(c["config"], dict) and c["config"].get("cached_content")
+    )
+    return {
+        "calls": len(fake.calls),
+        "calls_by_stage": dict(Counter(_stage(c["contents"]) for c in fake.calls)),
+        "inline_profile_calls": sum(1 for c in fake.calls if _RESUME[:200] in str(c["contents"])),
+        "cache_uploads": [u["name"] for u in fake.cache_uploads],
+        "cache_deletes": list(fake.cache_deletes),
+        "cached_refs": dict(cached_refs),
+        "uploaded_tokens": fake.uploaded_tokens(),
+        "client_creations": llm_gateway.client_creations(),
+        "qualifying_jobs": len(final.get("qualifying_jobs") or []),
+        "target": v3_graph.V3_TARGET_QUALIFYING_JOBS,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Parent: run both modes and compare
+# ---------------------------------------------------------------------------
+
+def _run_mode(cache_enabled: bool) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="joblens-fake-") as cache_dir:
+        env = dict(
+            os.environ,
+            GEMINI_BACKEND="fake",
+            GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY") or "fake",
+            GEMINI_CONTEXT_CACHE_ENABLED="1" if cache_enabled else "0",
+            GEMINI_RPM="100000",
+            GEMINI_FALLBACK_RPM="100000",
+            GEMINI_RETRY_BACKOFF_SECONDS="0",
+            JOBLENS_CACHE_DIR=cache_dir,
+        )
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            cwd=cache_dir, env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stdout[-4000:] + proc.stderr[-4000:])
+        raise SystemExit(f"Workflow run failed (exit {proc.returncode})")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(_child()))
+        return 0
+
+    cached = _run_mode(cache_enabled=True)
+    inline = _run_mode(cache_enabled=False)
+    for label, run in (("cached", cached), ("inline", inline)):
+        stages = ", ".join(f"{k} {v}" for k, v in sorted(run["calls_by_stage"].items()))
+        print(f"[BENCH] {label}: {run['calls']} calls ({stages}); {len(run['cache_uploads'])} cache uploads; "
+              f"~{run['uploaded_tokens']:,} prompt tokens; {run['qualifying_jobs']} qualifying jobs")
+
+    failures = []
+    uploads = cached["cache_uploads"]
+    # One upload per (model, search tools) pair: plain stages and search-grounded stages
+    if not 1 <= len(uploads) <= 2:
+        failures.append(f"expected 1-2 cached-content uploads, got {len(uploads)}")
+    unused = [name for name in uploads if not cached["cached_refs"].get(name)]
+    if unused:
+        failures.append(f"cached content uploaded but never referenced: {', '.join(unused)}")
+    if cached["inline_profile_calls"]:
+        failures.append(f"{cached['inline_profile_calls']} calls re-sent the profile inline despite caching")
+    if sorted(cached["cache_deletes"]) != sorted(uploads):
+        failures.append(f"cached content not deleted at run end (uploaded {uploads}, deleted {cached['cache_deletes']})")
+    if inline["cache_uploads"]:
+        failures.append("GEMINI_CONTEXT_CACHE_ENABLED=0 still uploaded cached content")
+    if cached["uploaded_tokens"] >= inline["uploaded_tokens"]:
+        failures.append(f"caching did not save tokens ({cached['uploaded_tokens']:,} vs {inline['uploaded_tokens']:,} inline)")
+    for label, run in (("cached", cached), ("inline", inline)):
+        if run["client_creations"] != 1:
+            failures.append(f"{label} run created {run['client_creations']} Gemini clients; expected one shared client")
+    if cached["qualifying_jobs"] != cached["target"]:
+        failures.append(f"expected {cached['target']} qualifying jobs, got {cached['qualifying_jobs']}")
+
+    saved = inline["uploaded_tokens"] - cached["uploaded_tokens"]
+    print(f"[BENCH] Context caching saved ~{saved:,} prompt tokens "
+          f"({100 * saved / max(1, inline['uploaded_tokens']):.0f}% of the inline run)")
+    for failure in failures:
+        print(f"[BENCH] FAIL: {failure}")
+    if not failures:
+        print("[BENCH] OK: one shared client; profile cached once per model/tools pair, "
+              "reused by every stage, deleted at run end")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Import Time Benchmark
+Purpose: Measure the API's cold-start import cost and check that heavy dependencies stay
+deferred until first use (serverless cold starts pay for every module-level import).
+Uses: `python -X importtime` in a fresh interpreter per run. Each run imports the target
+module (default: api), calls the /health handler, and reports which modules got loaded.
+Run:  python benchmarks/import_time.py [--module api] [--runs 5] [--top 15] [--budget-ms 0]
+Exit status is 1 if a deferred module was imported, or the median exceeds --budget-ms (when set).
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported only once a run starts (or a file is parsed), never by importing the API or /health
+DEFERRED_MODULES = [
+    "langgraph",
+    "langchain",
+    "langchain_google_genai",
+    "google.genai",
+    "jobspy",
+    "pandas",
+    "numpy",
+    "pdfminer",
+    "docx",
+    "dotenv",  # only when a .env file exists
+]
+
+_CHILD = """
+import json, sys
+import {module} as target
+if hasattr(target, "health"):
+    target.health()
+print(json.dumps(sorted(sys.modules)))
+"""
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def _run_once(module: str) -> Tuple[List[Tuple[int, int, int, str]], List[str]]:
+    """One fresh interpreter. Returns ([(self_us, cumulative_us, depth, name)], loaded module names)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.format(module=module)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"Importing {module} failed (exit {proc.returncode})")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(self_us), int(cumulative_us), (len(indent) - 1) // 2, name))
+    return rows, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _deferred_violations(loaded: List[str]) -> List[str]:
+    has_env_file = os.path.isfile(os.path.join(REPO_ROOT, ".env"))
+    violations = []
+    for name in DEFERRED_MODULES:
+        if name == "dotenv" and has_env_file:
+            continue
+        if any(m == name or m.startswith(name + ".") for m in loaded):
+            violations.append(name)
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--module", default="api", help="module to import (default: api)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to sample")
+    parser.add_argument("--top", type=int, default=15, help="packages to list by import time")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail if the median exceeds this (0 = no budget)")
+    args = parser.parse_args()
+
+    totals_ms: List[float] = []
+    by_package: Dict[str, List[int]] = defaultdict(list)
+    loaded: List[str] = []
+    for _ in range(max(1, args.runs)):
+        rows, loaded = _run_once(args.module)
+        # Depth-0 rows are the interpreter's top-level imports; their cumulative times add up to the total
+        totals_ms.append(sum(cum for _, cum, depth, _ in rows if depth == 0) / 1000)
+        run_packages: Dict[str, int] = defaultdict(int)
+        for self_us, _, _, name in rows:
+            run_packages[name.split(".")[0]] += self_us
+        for package, self_us in run_packages.items():
+            by_package[package].append(self_us)
+
+    median_ms = statistics.median(totals_ms)
+    print(f"[BENCH] import {args.module}: median {median_ms:.1f} ms over {len(totals_ms)} runs "
+          f"(min {min(totals_ms):.1f}, max {max(totals_ms):.1f})")
+    print(f"[BENCH] Slowest packages (median self time):")
+    ranked = sorted(by_package.items(), key=lambda kv: statistics.median(kv[1]), reverse=True)
+    for package, samples in ranked[:args.top]:
+        print(f"  {statistics.median(samples) / 1000:8.1f} ms  {package}")
+
+    failed = False
+    violations = _deferred_violations(loaded)
+    if violations:
+        failed = True
+        print(f"[BENCH] FAIL: deferred modules imported at startup: {', '.join(violations)}")
+    else:
+        print(f"[BENCH] OK: none of {', '.join(DEFERRED_MODULES)} imported")
+    if args.budget_ms and median_ms > args.budget_ms:
+        failed = True
+        print(f"[BENCH] FAIL: median {median_ms:.1f} ms exceeds the {args.budget_ms:g} ms budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { AgentTimeline } from "@/components/AgentTimeline";
 import { mockAgentSteps, AgentStep } from "@/data/mockData";
-import { submitAnalysis, pollStatus, type JobType } from "@/services/api";
+import { submitAnalysis, pollStatus, subscribeEvents, type JobType, type ProgressEvent } from "@/services/api";
 
 const POLL_INTERVAL_MS = 3000;
 
@@ -21,16 +21,56 @@ const Index = () => {
   const [isRunning, setIsRunning] = useState(false);
   const [isDone, setIsDone] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [queuePosition, setQueuePosition] = useState<number | null>(null);
 
   const pollRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  const eventsRef = useRef<(() => void) | null>(null);
 
   const stopPolling = () => {
     if (pollRef.current) {
       clearInterval(pollRef.current);
       pollRef.current = null;
     }
+    if (eventsRef.current) {
+      eventsRef.current();
+      eventsRef.current = null;
+    }
   };
 
+  const finish = useCallback((status: "completed" | "error", message?: string | null) => {
+    stopPolling();
+    setIsRunning(false);
+    setQueuePosition(null);
+    if (status === "completed") {
+      setIsDone(true);
+      setTimeout(() => navigate("/dashboard"), 1200);
+    } else {
+      setError(message ?? "An error occurred during analysis.");
+    }
+  }, [navigate]);
+
+  const applyEvent = useCallback((event: ProgressEvent) => {
+    if (event.type === "step") {
+      setSteps((prev) =>
+        prev.map((s, i) =>
+          i === event.step ? { ...s, status: event.status, duration: event.duration ?? s.duration } : s
+        )
+      );
+    } else if (event.type === "log") {
+      setSteps((prev) =>
+        prev.map((s, i) => (i === event.step ? { ...s, logs: [...(s.logs ?? []), event.message] } : s))
+      );
+    } else if (event.type === "queue") {
+      setQueuePosition(event.position);
+    } else if (event.type === "status") {
+      if (event.status === "completed" || event.status === "error") {
+        finish(event.status, event.error);
+      } else if (event.status !== "queued") {
+        setQueuePosition(null);
+      }
+    }
+  }, [finish]);
+
   const launchAgents = useCallback(async () => {
     if (!resumeFile) {
       setError("Please upload your resume before launching.");
@@ -40,6 +80,7 @@ const Index = () => {
     setError(null);
     setIsRunning(true);
     setIsDone(false);
+    setQueuePosition(null);
     setSteps(mockAgentSteps.map((s) => ({ ...s, status: "pending" as const })));
     localStorage.removeItem("joblens_jobs");
 
@@ -54,6 +95,15 @@ const Index = () => {
 
     localStorage.setItem("joblens_job_id", jobId);
 
+    // Progress is pushed over SSE; if the stream is unavailable, fall back to polling.
+    eventsRef.current = subscribeEvents(jobId, applyEvent, () => {
+      eventsRef.current = null;
+      startPolling(jobId);
+    });
+  }, [resumeFile, coverLetterFile, jobType, applyEvent]);
+
+  const startPolling = (jobId: string) => {
+    if (pollRef.current) return;
     pollRef.current = setInterval(async () => {
       try {
         const status = await pollStatus(jobId);
@@ -68,16 +118,10 @@ const Index = () => {
             logs: s.logs ?? [],
           }))
         );
+        setQueuePosition(status.status === "queued" ? status.queue_position ?? null : null);
 
-        if (status.status === "completed") {
-          stopPolling();
-          setIsRunning(false);
-          setIsDone(true);
-          setTimeout(() => navigate("/dashboard"), 1200);
-        } else if (status.status === "error") {
-          stopPolling();
-          setIsRunning(false);
-          setError(status.error ?? "An error occurred during analysis.");
+        if (status.status === "completed" || status.status === "error") {
+          finish(status.status, status.error);
         }
       } catch (err) {
         const message = err instanceof Error ? err.message : String(err);
@@ -91,7 +135,7 @@ const Index = () => {
         }
       }
     }, POLL_INTERVAL_MS);
-  }, [resumeFile, coverLetterFile, jobType, navigate]);
+  };
 
   const reset = () => {
     stopPolling();
@@ -99,6 +143,7 @@ const Index = () => {
     setIsRunning(false);
     setIsDone(false);
     setError(null);
+    setQueuePosition(null);
     localStorage.removeItem("joblens_job_id");
     localStorage.removeItem("joblens_jobs");
   };
@@ -126,7 +171,7 @@ const Index = () => {
             className="shadow-lg shadow-primary/20"
           >
             <Play className="h-4 w-4 mr-1.5" />
-            {isRunning ? "Agents Running..." : "Launch Agents"}
+            {isRunning ? (queuePosition !== null ? "Queued..." : "Agents Running...") : "Launch Agents"}
           </Button>
         </div>
       </div>
@@ -243,6 +288,11 @@ const Index = () => {
           </CardTitle>
         </CardHeader>
         <CardContent>
+          {queuePosition !== null && (
+            <p className="text-sm text-muted-foreground mb-3">
+              Waiting in queue — position {queuePosition}. Your analysis starts as soon as a slot frees up.
+            </p>
+          )}
           <AgentTimeline steps={steps} />
         </CardContent>
       </Card>
@@ -7,7 +7,8 @@ const BASE =
     : "/api";
 
 export interface StatusResponse {
-  status: "running" | "completed" | "error";
+  status: "queued" | "running" | "completed" | "error";
+  queue_position?: number | null;
   steps: AgentStep[];
   error?: string | null;
 }
@@ -42,6 +43,16 @@ export async function submitAnalysis(
     body: form,
   });
 
+  if (res.status === 429) {
+    const retryAfter = res.headers.get("Retry-After");
+    throw new Error(
+      `The server is busy with other analyses. Please try again${retryAfter ? ` in about ${retryAfter}s` : " shortly"}.`
+    );
+  }
+  if (res.status === 413) {
+    const body = await res.json().catch(() => null);
+    throw new Error(body?.detail ?? "The uploaded file is too large.");
+  }
   if (!res.ok) {
     const text = await res.text();
     throw new Error(`Failed to start analysis: ${text}`);
@@ -68,6 +79,51 @@ export async function pollStatus(jobId: string): Promise<StatusResponse> {
   return res.json();
 }
 
+export type ProgressEvent =
+  | { seq: number; type: "step"; step: number; status: AgentStep["status"]; duration?: string | null }
+  | { seq: number; type: "log"; step: number; message: string }
+  | { seq: number; type: "results"; count: number }
+  | { seq: number; type: "queue"; position: number }
+  | { seq: number; type: "status"; status: StatusResponse["status"]; error?: string | null };
+
+/**
+ * GET /api/events/{job_id}
+ * Server-Sent Events stream of step transitions, log lines and queue position updates.
+ * Calls onEvent for each event and onError if the stream drops before the job
+ * finishes (callers fall back to polling). Returns a function that closes the stream.
+ */
+export function subscribeEvents(
+  jobId: string,
+  onEvent: (event: ProgressEvent) => void,
+  onError: () => void
+): () => void {
+  if (typeof EventSource === "undefined") {
+    onError();
+    return () => {};
+  }
+  const source = new EventSource(`${BASE}/events/${jobId}`);
+  let finished = false;
+  const handle = (msg: MessageEvent) => {
+    const event = JSON.parse(msg.data) as ProgressEvent;
+    if (event.type === "status" && (event.status === "completed" || event.status === "error")) {
+      finished = true;
+      source.close();
+    }
+    onEvent(event);
+  };
+  for (const type of ["step", "log", "results", "queue", "status"]) {
+    source.addEventListener(type, handle as EventListener);
+  }
+  source.onerror = () => {
+    source.close();
+    if (!finished) onError();
+  };
+  return () => {
+    finished = true;
+    source.close();
+  };
+}
+
 /**
  * GET /api/results/{job_id}
  * Returns the final mapped job listings.
@@ -4,9 +4,34 @@ Allows easy switching between models and fallback logic.
 """
 
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+
+def _find_env_file():
+    """
+    .env next to this file, else the search dotenv's find_dotenv(usecwd=True) does: the
+    working directory, then each of its parents. Done with os.path so python-dotenv is
+    only imported when there is a .env file to load; deployments (e.g. Vercel) set real
+    environment variables and skip it on cold start.
+    """
+    candidate = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+    if os.path.isfile(candidate):
+        return candidate
+    path = os.getcwd()
+    while True:
+        candidate = os.path.join(path, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+_ENV_FILE = _find_env_file()
+if _ENV_FILE:
+    from dotenv import load_dotenv
+
+    load_dotenv(_ENV_FILE)
 
 # Model configuration
 PRIMARY_MODEL = "gemini-2.0-flash"
@@ -18,6 +43,139 @@ FALLBACK_MODEL = "gemini-2.0-flash-lite"
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 SCRAPFLY_KEY = os.getenv("SCRAPFLY_KEY")
 
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer from the environment, falling back to default on missing/invalid values."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float from the environment, falling back to default on missing/invalid values."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Gemini quota per model: requests per minute and tokens per minute.
+# Defaults match the free tier; raise them via env vars on paid plans.
+GEMINI_RATE_LIMITS = {
+    PRIMARY_MODEL: {
+        "rpm": _env_int("GEMINI_RPM", 15),
+        "tpm": _env_int("GEMINI_TPM", 1_000_000),
+    },
+    FALLBACK_MODEL: {
+        "rpm": _env_int("GEMINI_FALLBACK_RPM", 30),
+        "tpm": _env_int("GEMINI_FALLBACK_TPM", 1_000_000),
+    },
+}
+
+# Gemini backend: "google" (real API) or "fake" (offline stand-in from tools.llm_gateway)
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "google").strip().lower()
+
+# Max pooled HTTP connections held by the shared Gemini client (sized for concurrent runs)
+GEMINI_HTTP_POOL_SIZE = _env_int("GEMINI_HTTP_POOL_SIZE", 32)
+
+# Stream batch responses so per-job results can be published as soon as they arrive
+GEMINI_STREAMING_ENABLED = os.getenv("GEMINI_STREAMING_ENABLED", "1") != "0"
+
+# Explicit context caching of the candidate profile (resume + cover letter) shared by all prompts.
+# Gemini only accepts cached content above a minimum size; smaller profiles are sent inline.
+GEMINI_CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "1") != "0"
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = _env_int("GEMINI_CONTEXT_CACHE_MIN_TOKENS", 4096)
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = _env_int("GEMINI_CONTEXT_CACHE_TTL_SECONDS", 1800)
+
+# Base delay before retrying a Gemini call that failed (doubled on each 429)
+GEMINI_RETRY_BACKOFF_SECONDS = _env_float("GEMINI_RETRY_BACKOFF_SECONDS", 4.0)
+
+
+# Phase 1 (title, page) planner: "heuristic" (no LLM), "llm" (agent call every round),
+# or "hybrid" (heuristic, asking the LLM agent only when recent rounds stall)
+PHASE1_PLANNER_MODE = os.getenv("PHASE1_PLANNER_MODE", "hybrid").strip().lower()
+
+# Local pre-filter before LLM scoring: jobs whose resume similarity is below the threshold
+# are dropped (the top PREFILTER_MIN_KEEP of each batch are always scored)
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "1") != "0"
+PREFILTER_MIN_SIMILARITY = _env_float("PREFILTER_MIN_SIMILARITY", 0.05)
+PREFILTER_MIN_KEEP = _env_int("PREFILTER_MIN_KEEP", 3)
+
+# Persistent local cache (SQLite). Point JOBLENS_CACHE_DIR at a writable dir (e.g. /tmp on serverless).
+CACHE_DIR = os.getenv("JOBLENS_CACHE_DIR", "data")
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "joblens_cache.sqlite3")
+
+# API run store: "memory" (single process, LRU/TTL bounded) or "sqlite" (shared by all
+# uvicorn workers on the host and kept across restarts)
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "memory").strip().lower()
+JOB_STORE_PATH = os.path.join(CACHE_DIR, "joblens_jobs.sqlite3")
+JOB_STORE_TTL_SECONDS = _env_int("JOB_STORE_TTL_SECONDS", 24 * 3600)
+JOB_STORE_MAX_JOBS = _env_int("JOB_STORE_MAX_JOBS", 500)
+
+# API run scheduler: concurrent workflow runs, how many may wait, and how long shutdown drains
+RUN_WORKERS = _env_int("RUN_WORKERS", 2)
+RUN_QUEUE_MAX = _env_int("RUN_QUEUE_MAX", 20)
+RUN_DRAIN_TIMEOUT_SECONDS = _env_int("RUN_DRAIN_TIMEOUT_SECONDS", 300)
+
+# Upload text extraction: a process pool keeps pdfminer off the API event loop (set
+# EXTRACT_PROCESS_POOL=0 to use threads instead, e.g. where multiprocessing is unavailable)
+EXTRACT_PROCESS_POOL = os.getenv("EXTRACT_PROCESS_POOL", "1") != "0"
+EXTRACT_WORKERS = _env_int("EXTRACT_WORKERS", 2)
+EXTRACT_TIMEOUT_SECONDS = _env_float("EXTRACT_TIMEOUT_SECONDS", 30.0)
+EXTRACT_MAX_BYTES = _env_int("EXTRACT_MAX_BYTES", 10 * 1024 * 1024)  # per uploaded file
+# Uploads up to this size are extracted from memory; larger ones from a temp file via mmap
+UPLOAD_SPOOL_BYTES = _env_int("UPLOAD_SPOOL_BYTES", 1024 * 1024)
+# PDFs: cheap no-layout pass first, full layout analysis only when its text looks wrong
+# (fewer than MIN_CHARS_PER_PAGE characters per page, or run-together words). PDFs longer
+# than EXTRACT_PDF_MAX_PAGES (0 = no limit) skip straight to the full layout pass once the
+# fast pass reaches the limit; the full pass always reads every page.
+EXTRACT_PDF_FAST_ENABLED = os.getenv("EXTRACT_PDF_FAST_ENABLED", "1") != "0"
+EXTRACT_PDF_FAST_MIN_CHARS_PER_PAGE = _env_int("EXTRACT_PDF_FAST_MIN_CHARS_PER_PAGE", 200)
+EXTRACT_PDF_MAX_PAGES = _env_int("EXTRACT_PDF_MAX_PAGES", 20)
+# Extracted text keyed by SHA-256 of the uploaded bytes: in-process LRU, plus the SQLite
+# cache unless EXTRACT_CACHE_DISK=0
+EXTRACT_CACHE_ENABLED = os.getenv("EXTRACT_CACHE_ENABLED", "1") != "0"
+EXTRACT_CACHE_DISK = os.getenv("EXTRACT_CACHE_DISK", "1") != "0"
+EXTRACT_CACHE_MEMORY_ENTRIES = _env_int("EXTRACT_CACHE_MEMORY_ENTRIES", 64)
+EXTRACT_CACHE_MAX_ENTRIES = _env_int("EXTRACT_CACHE_MAX_ENTRIES", 1000)
+EXTRACT_CACHE_TTL_SECONDS = _env_int("EXTRACT_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+
+# Scraped postings (by URL) and search result lists (by search term / hours_old / location)
+SCRAPE_CACHE_ENABLED = os.getenv("SCRAPE_CACHE_ENABLED", "1") != "0"
+SCRAPE_POSTING_TTL_SECONDS = _env_int("SCRAPE_POSTING_TTL_SECONDS", 24 * 3600)
+SCRAPE_POSTING_MAX_ENTRIES = _env_int("SCRAPE_POSTING_MAX_ENTRIES", 5000)
+SCRAPE_SEARCH_TTL_SECONDS = _env_int("SCRAPE_SEARCH_TTL_SECONDS", 3600)
+SCRAPE_SEARCH_MAX_ENTRIES = _env_int("SCRAPE_SEARCH_MAX_ENTRIES", 500)
+# Stored description length; prompts compact it to their own token budgets
+SCRAPE_DESCRIPTION_MAX_CHARS = _env_int("SCRAPE_DESCRIPTION_MAX_CHARS", 6000)
+
+
+# Prompt budgets (estimated tokens, ~4 chars each) for job descriptions packed into each LLM batch.
+# Descriptions are de-boilerplated and requirement sections kept first before being cut to fit.
+PROMPT_SCORING_BATCH_TOKENS = _env_int("PROMPT_SCORING_BATCH_TOKENS", 3000)
+PROMPT_SCORING_JOB_TOKENS = _env_int("PROMPT_SCORING_JOB_TOKENS", 120)
+PROMPT_WRITER_BATCH_TOKENS = _env_int("PROMPT_WRITER_BATCH_TOKENS", 1200)
+PROMPT_PROJECTS_BATCH_TOKENS = _env_int("PROMPT_PROJECTS_BATCH_TOKENS", 1200)
+PROMPT_RELEVANCE_BATCH_TOKENS = _env_int("PROMPT_RELEVANCE_BATCH_TOKENS", 1200)
+PROMPT_JOB_MAX_TOKENS = _env_int("PROMPT_JOB_MAX_TOKENS", 500)
+# Full resume / cover letter caps for the shared candidate profile
+PROMPT_RESUME_MAX_TOKENS = _env_int("PROMPT_RESUME_MAX_TOKENS", 12_500)
+PROMPT_COVER_LETTER_MAX_TOKENS = _env_int("PROMPT_COVER_LETTER_MAX_TOKENS", 3_750)
+
+
+# Job relevance scores keyed by (resume/cover fingerprint, posting URL, description hash)
+SCORE_CACHE_ENABLED = os.getenv("SCORE_CACHE_ENABLED", "1") != "0"
+SCORE_CACHE_TTL_SECONDS = _env_int("SCORE_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+SCORE_CACHE_MAX_ENTRIES = _env_int("SCORE_CACHE_MAX_ENTRIES", 20000)
+
+
+# Suggested job titles keyed by (resume hash, cover letter hash, job_type)
+TITLE_CACHE_ENABLED = os.getenv("TITLE_CACHE_ENABLED", "1") != "0"
+TITLE_CACHE_TTL_SECONDS = _env_int("TITLE_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+TITLE_CACHE_MAX_ENTRIES = _env_int("TITLE_CACHE_MAX_ENTRIES", 2000)
+
+
 def get_model_name(use_fallback: bool = False) -> str:
     """
     Get the model name to use.
@@ -31,3 +189,16 @@ def get_model_name(use_fallback: bool = False) -> str:
     if use_fallback:
         return FALLBACK_MODEL
     return PRIMARY_MODEL
+
+
+def get_rate_limits(model: str) -> dict:
+    """
+    Get the requests-per-minute and tokens-per-minute quota for a model.
+
+    Args:
+        model: Gemini model name
+
+    Returns:
+        Dict with "rpm" and "tpm" keys (unknown models get the primary model's quota)
+    """
+    return GEMINI_RATE_LIMITS.get(model) or GEMINI_RATE_LIMITS[PRIMARY_MODEL]
@@ -0,0 +1,198 @@
+"""
+Persistent Cache Tool
+Purpose: Small SQLite-backed key/value cache shared by the tools and agents.
+Each PersistentCache is one table in a single database file (WAL mode, safe across
+threads and processes). Entries expire after a TTL and the least recently used
+entries are evicted once a table grows past its size bound.
+Values are stored as JSON, so only JSON-serializable data can be cached.
+An optional in-process LRU in front of a table serves hot keys without touching SQLite.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CACHE_DB_PATH
+
+
+_local = threading.local()
+_disabled_reason: Optional[str] = None
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    """Per-thread connection to the cache database, or None if it cannot be opened."""
+    global _disabled_reason
+    if _disabled_reason:
+        return None
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    try:
+        Path(CACHE_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(CACHE_DB_PATH, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except (sqlite3.Error, OSError) as e:
+        # Read-only or ephemeral filesystems: run without a persistent cache.
+        _disabled_reason = str(e)
+        print(f"[CACHE] Persistent cache disabled ({e})", flush=True)
+        return None
+    _local.conn = conn
+    return conn
+
+
+def fingerprint(*parts: str) -> str:
+    """SHA-256 hex digest of the given strings (joined with a separator)."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update((p or "").encode("utf-8", errors="replace"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def normalized_fingerprint(*parts: str) -> str:
+    """Fingerprint that ignores case and whitespace/layout differences in the given strings."""
+    return fingerprint(*(" ".join((p or "").lower().split()) for p in parts))
+
+
+class PersistentCache:
+    """
+    TTL + size-bounded key/value table.
+
+    Args:
+        name:        Table name (letters, digits, underscores)
+        ttl_seconds: Entries older than this are treated as missing
+        max_entries: After inserts, least recently used rows beyond this are deleted
+        memory_entries: Size of the in-process LRU kept in front of the table (0 = none)
+        persist:     False keeps entries in the in-process LRU only (no SQLite table)
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int, memory_entries: int = 0,
+                 persist: bool = True):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+            raise ValueError(f"Invalid cache name: {name!r}")
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.persist = persist
+        self._ready = threading.local()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        if not self.memory_entries:
+            return None
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def _memory_set(self, key: str, value: Any, stored_at: float) -> None:
+        if not self.memory_entries:
+            return
+        with self._memory_lock:
+            self._memory[key] = (copy.deepcopy(value), stored_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.persist:
+            return None
+        conn = _connect()
+        if conn is None:
+            return None
+        if not getattr(self._ready, "done", False):
+            try:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_accessed ON {self.name}(accessed_at)")
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"[CACHE] Could not create table {self.name}: {e}", flush=True)
+                return None
+            self._ready.done = True
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        conn = self._conn()
+        if conn is None:
+            return None
+        now = time.time()
+        try:
+            row = conn.execute(
+                f"SELECT value, stored_at FROM {self.name} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute(f"UPDATE {self.name} SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            value = json.loads(row[0])
+            self._memory_set(key, value, row[1])
+            return value
+        except (sqlite3.Error, ValueError) as e:
+            print(f"[CACHE] {self.name} read failed: {e}", flush=True)
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value and evict expired / least recently used rows."""
+        now = time.time()
+        self._memory_set(key, value, now)
+        conn = self._conn()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False, default=str), now, now),
+            )
+            conn.execute(f"DELETE FROM {self.name} WHERE stored_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                f"DELETE FROM {self.name} WHERE key IN ("
+                f"SELECT key FROM {self.name} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"[CACHE] {self.name} write failed: {e}", flush=True)
+
+    def delete(self, key: str) -> None:
+        with self._memory_lock:
+            self._memory.pop(key, None)
+        conn = self._conn()
+        if conn is None:
+            return
+        try:
+            conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"[CACHE] {self.name} delete failed: {e}", flush=True)
@@ -0,0 +1,239 @@
+"""
+Extraction Pool Tool
+Purpose: Run upload text extraction (tools.text_extractor) off the API event loop.
+Uses: A ProcessPoolExecutor, because pdfminer is pure Python and holds the GIL.
+A thread pool is the fallback when EXTRACT_PROCESS_POOL=0 or no process pool can be started.
+Every call has a size cap and a timeout. A worker that times out is terminated and the pool
+is recreated, so one pathological PDF cannot keep a slot busy.
+Latency is recorded per format (pdf / docx / text) for /metrics. PDFs also get a per-tier
+breakdown (fast no-layout pass vs full layout) and a count of fast-tier fallbacks.
+The content-hash text cache is checked here, in the parent process, before anything is
+dispatched. A re-uploaded file never reaches a worker.
+Large uploads spooled to a temporary file (tools.upload_spool) are passed to workers by
+path and mmapped there, so their bytes are never pickled.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, Executor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXTRACT_MAX_BYTES, EXTRACT_PROCESS_POOL, EXTRACT_TIMEOUT_SECONDS, EXTRACT_WORKERS
+from tools.text_extractor import cached_text, detect_format, extract_text_timed, store_text, text_cache_key
+from tools.upload_spool import FileTooLarge, SpooledUpload
+
+
+class ExtractionTimeout(TimeoutError):
+    """Extraction did not finish within the timeout."""
+
+
+# ---------------------------------------------------------------------------
+# Executors
+# ---------------------------------------------------------------------------
+
+_pool: Optional[Executor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _mp_context():
+    # forkserver/spawn children start clean instead of inheriting the API's threads and locks
+    import multiprocessing
+
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _threads() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=max(1, EXTRACT_WORKERS), thread_name_prefix="extract")
+        return _thread_pool
+
+
+def _executor() -> Executor:
+    """Process pool when enabled and available, otherwise the thread pool."""
+    global _pool
+    if not EXTRACT_PROCESS_POOL:
+        return _threads()
+    with _pool_lock:
+        if _pool is None:
+            # Deferred: multiprocessing is only needed once the first upload is parsed
+            from concurrent.futures import ProcessPoolExecutor
+
+            try:
+                _pool = ProcessPoolExecutor(max_workers=max(1, EXTRACT_WORKERS), mp_context=_mp_context())
+                print(f"[EXTRACT] Process pool started ({max(1, EXTRACT_WORKERS)} workers)", flush=True)
+            except (OSError, NotImplementedError, ValueError) as e:
+                # e.g. no /dev/shm semaphores on some serverless runtimes
+                print(f"[EXTRACT] Process pool unavailable ({e}); using threads", flush=True)
+                _pool = _threads()
+        return _pool
+
+
+def _discard_pool(pool: Executor) -> None:
+    """Drop a broken or stuck process pool, terminating its workers, so the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    if not isinstance(pool, ThreadPoolExecutor):
+        # The executor has no public way to stop a running task; terminate its processes directly
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for proc in processes:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+
+
+def shutdown_extraction_pool() -> None:
+    global _pool, _thread_pool
+    with _pool_lock:
+        pool, threads = _pool, _thread_pool
+        _pool = _thread_pool = None
+    for executor in {id(e): e for e in (pool, threads) if e is not None}.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_METRIC_WINDOW = 200  # recent samples kept per format for percentiles
+_metrics: Dict[str, dict] = {}
+_metrics_lock = threading.Lock()
+
+
+def _record(fmt: str, seconds: float, outcome: str, tiers: Optional[Dict[str, float]] = None) -> None:
+    with _metrics_lock:
+        m = _metrics.setdefault(fmt, {
+            "count": 0, "errors": 0, "timeouts": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+            "recent": deque(maxlen=_METRIC_WINDOW), "tiers": {}, "fallbacks": 0,
+        })
+        for tier, tier_seconds in (tiers or {}).items():
+            t = m["tiers"].setdefault(tier, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            t["count"] += 1
+            t["total_seconds"] += tier_seconds
+            t["max_seconds"] = max(t["max_seconds"], tier_seconds)
+        if tiers and len(tiers) > 1:
+            m["fallbacks"] += 1  # the fast tier ran and its text was rejected
+        m["count"] += 1
+        if outcome == "error":
+            m["errors"] += 1
+        elif outcome == "timeout":
+            m["timeouts"] += 1
+        m["total_seconds"] += seconds
+        m["max_seconds"] = max(m["max_seconds"], seconds)
+        m["recent"].append(seconds)
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def extraction_metrics() -> Dict[str, Any]:
+    """
+    Per-format extraction latency: count, errors, timeouts, mean / p50 / p95 / max seconds,
+    plus per-tier count / mean / max seconds and fallbacks where the format has tiers (PDF).
+    """
+    with _metrics_lock:
+        out = {}
+        for fmt, m in _metrics.items():
+            recent = sorted(m["recent"])
+            out[fmt] = {
+                "count": m["count"],
+                "errors": m["errors"],
+                "timeouts": m["timeouts"],
+                "mean_seconds": round(m["total_seconds"] / m["count"], 4) if m["count"] else 0.0,
+                "p50_seconds": round(_percentile(recent, 0.50), 4),
+                "p95_seconds": round(_percentile(recent, 0.95), 4),
+                "max_seconds": round(m["max_seconds"], 4),
+            }
+            if m["tiers"]:
+                out[fmt]["fallbacks"] = m["fallbacks"]
+                out[fmt]["tiers"] = {
+                    tier: {
+                        "count": t["count"],
+                        "mean_seconds": round(t["total_seconds"] / t["count"], 4),
+                        "max_seconds": round(t["max_seconds"], 4),
+                    }
+                    for tier, t in m["tiers"].items()
+                }
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Async entry point
+# ---------------------------------------------------------------------------
+
+async def extract_text_async(
+    upload: Union[bytes, SpooledUpload], filename: str, timeout: Optional[float] = None
+) -> str:
+    """
+    extract_text() on the extraction pool without blocking the event loop.
+
+    Args:
+        upload: File bytes, or a SpooledUpload from read_upload (left open; the caller closes it)
+
+    Raises:
+        FileTooLarge: the file exceeds EXTRACT_MAX_BYTES
+        ExtractionTimeout: no result within timeout (default EXTRACT_TIMEOUT_SECONDS)
+    Parser errors propagate unchanged.
+    """
+    if not isinstance(upload, SpooledUpload):
+        upload = SpooledUpload(filename, data=upload, size=len(upload))
+    size = upload.size
+    if size > EXTRACT_MAX_BYTES:
+        raise FileTooLarge(size, EXTRACT_MAX_BYTES)
+    with upload.buffer() as buffer:
+        key = text_cache_key(buffer, filename)
+        fmt = detect_format(buffer, filename)
+    text = cached_text(key)
+    if text is not None:
+        print(f"[EXTRACT] Cache hit: {size:,} bytes -> {len(text):,} chars", flush=True)
+        return text
+    timeout = EXTRACT_TIMEOUT_SECONDS if timeout is None else timeout
+    source = upload.source  # bytes, or the spool file's path
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    executor = _executor()
+    try:
+        try:
+            text, tiers = await asyncio.wait_for(
+                loop.run_in_executor(executor, extract_text_timed, source, filename), timeout=timeout
+            )
+        except BrokenExecutor:
+            # A worker died (e.g. killed after another call's timeout); retry once on threads
+            print(f"[EXTRACT] Process pool broken; retrying {fmt} extraction on a thread", flush=True)
+            _discard_pool(executor)
+            remaining = max(0.1, timeout - (time.perf_counter() - start))
+            text, tiers = await asyncio.wait_for(
+                loop.run_in_executor(_threads(), extract_text_timed, source, filename), timeout=remaining
+            )
+    except asyncio.TimeoutError:
+        elapsed = time.perf_counter() - start
+        _record(fmt, elapsed, "timeout")
+        print(f"[EXTRACT] {fmt} extraction timed out after {elapsed:.1f}s ({size:,} bytes)", flush=True)
+        if not isinstance(executor, ThreadPoolExecutor):
+            _discard_pool(executor)
+        raise ExtractionTimeout(f"Text extraction took longer than {timeout:g}s")
+    except Exception:
+        _record(fmt, time.perf_counter() - start, "error")
+        raise
+    elapsed = time.perf_counter() - start
+    _record(fmt, elapsed, "ok", tiers)
+    store_text(key, text)
+    tier_note = "".join(f", {tier} {seconds:.2f}s" for tier, seconds in tiers.items())
+    print(f"[EXTRACT] {fmt}: {size:,} bytes -> {len(text):,} chars in {elapsed:.2f}s{tier_note}", flush=True)
+    return text
@@ -0,0 +1,265 @@
+"""
+Job Store Tool
+Purpose: Storage for API runs (status, steps, results, progress events) behind one interface.
+Backends:
+- MemoryJobStore: in-process, bounded by LRU size and TTL (default; single worker)
+- SqliteJobStore: SQLite file in WAL mode, shared by every uvicorn worker on the host
+  and kept across restarts
+Each run is an entry dict plus an append-only list of sequenced events (seq starts at 1).
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import JOB_STORE_BACKEND, JOB_STORE_MAX_JOBS, JOB_STORE_PATH, JOB_STORE_TTL_SECONDS
+
+# fn(entry) mutates the entry in place and may return an event dict ({"type": ..., ...})
+Mutation = Callable[[dict], Optional[dict]]
+
+
+class JobStore(ABC):
+    """
+    Interface shared by the backends.
+
+    poll_interval: how often SSE streams should re-check for events written by other
+    processes (None when every writer is in this process and local wakeups suffice).
+    """
+
+    poll_interval: Optional[float] = None
+
+    @abstractmethod
+    def put(self, job_id: str, entry: dict) -> None:
+        """Create or replace a run."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        """Snapshot of the run's entry (a copy), or None if unknown / expired."""
+
+    @abstractmethod
+    def mutate(self, job_id: str, fn: Mutation) -> Optional[dict]:
+        """
+        Atomically apply fn to the entry. If fn returns an event, it is appended with the
+        next seq in the same step and returned; otherwise returns None (also for unknown runs).
+        """
+
+    @abstractmethod
+    def events_since(self, job_id: str, since: int) -> List[dict]:
+        """Events with seq > since, in order."""
+
+    @abstractmethod
+    def delete(self, job_id: str) -> None:
+        """Forget a run and its events (no-op if unknown)."""
+
+
+# ---------------------------------------------------------------------------
+# In-memory (LRU + TTL)
+# ---------------------------------------------------------------------------
+
+class MemoryJobStore(JobStore):
+    """Runs kept in an OrderedDict; the least recently updated beyond max_jobs or older than ttl are dropped."""
+
+    def __init__(self, max_jobs: int = JOB_STORE_MAX_JOBS, ttl_seconds: float = JOB_STORE_TTL_SECONDS):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()  # job_id -> {entry, events, updated_at}
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._jobs:
+            job_id, record = next(iter(self._jobs.items()))
+            if len(self._jobs) > self.max_jobs or now - record["updated_at"] > self.ttl_seconds:
+                del self._jobs[job_id]
+            else:
+                break
+
+    def _record(self, job_id: str) -> Optional[dict]:
+        record = self._jobs.get(job_id)
+        if record is not None and time.time() - record["updated_at"] > self.ttl_seconds:
+            del self._jobs[job_id]
+            return None
+        return record
+
+    def put(self, job_id: str, entry: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {"entry": copy.deepcopy(entry), "events": [], "updated_at": now}
+            self._jobs.move_to_end(job_id)
+            self._evict(now)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            record = self._record(job_id)
+            return copy.deepcopy(record["entry"]) if record else None
+
+    def mutate(self, job_id: str, fn: Mutation) -> Optional[dict]:
+        with self._lock:
+            record = self._record(job_id)
+            if record is None:
+                return None
+            event = fn(record["entry"])
+            record["updated_at"] = time.time()
+            self._jobs.move_to_end(job_id)
+            if event is None:
+                return None
+            event = {"seq": len(record["events"]) + 1, **event}
+            record["events"].append(event)
+            return dict(event)
+
+    def events_since(self, job_id: str, since: int) -> List[dict]:
+        with self._lock:
+            record = self._record(job_id)
+            return [dict(e) for e in record["events"][max(0, since):]] if record else []
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+# ---------------------------------------------------------------------------
+# SQLite (WAL) — shared across worker processes
+# ---------------------------------------------------------------------------
+
+class SqliteJobStore(JobStore):
+    """
+    Entries are JSON rows in `jobs`; events are rows in `job_events`. mutate() runs
+    read-modify-write inside BEGIN IMMEDIATE, so concurrent writers from several
+    processes serialize on the database lock instead of overwriting each other.
+    """
+
+    poll_interval = 1.0
+
+    def __init__(self, path: str = JOB_STORE_PATH, max_jobs: int = JOB_STORE_MAX_JOBS,
+                 ttl_seconds: float = JOB_STORE_TTL_SECONDS):
+        self.path = path
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "job_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (job_id, seq))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs(updated_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly where needed
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "DELETE FROM jobs WHERE updated_at < ? OR job_id IN ("
+            "SELECT job_id FROM jobs ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (now - self.ttl_seconds, self.max_jobs),
+        )
+        conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+
+    def put(self, job_id: str, entry: dict) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+                (job_id, json.dumps(entry, default=str), now),
+            )
+            conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT data, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def mutate(self, job_id: str, fn: Mutation) -> Optional[dict]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            entry = json.loads(row[0])
+            event = fn(entry)
+            conn.execute(
+                "UPDATE jobs SET data = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(entry, default=str), time.time(), job_id),
+            )
+            if event is not None:
+                (last,) = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM job_events WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                event = {"seq": last + 1, **event}
+                conn.execute(
+                    "INSERT INTO job_events (job_id, seq, data) VALUES (?, ?, ?)",
+                    (job_id, event["seq"], json.dumps(event, default=str)),
+                )
+            conn.execute("COMMIT")
+            return event
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def events_since(self, job_id: str, since: int) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, since)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def delete(self, job_id: str) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Process-wide store selected by JOB_STORE_BACKEND ("memory" or "sqlite")."""
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            if JOB_STORE_BACKEND == "sqlite":
+                _store = SqliteJobStore()
+            else:
+                _store = MemoryJobStore()
+            print(f"[API] Job store: {type(_store).__name__}", flush=True)
+        return _store
@@ -0,0 +1,622 @@
+"""
+LLM Gateway Tool
+Purpose: Single entry point for every Gemini call made by the agents.
+Owns:
+- one lazily-created, process-wide genai.Client with a pooled HTTP transport
+- rate limiting (tools.rate_limiter) and retry/fallback on errors
+- a background asyncio loop that fans batches of prompts out concurrently (generate_text_batch)
+- explicit context caching: a ProfileContext uploads the candidate profile once as cached
+  content and every stage references it instead of re-sending the resume
+- structured output: a response_schema makes Gemini return JSON (application/json) directly
+- streaming: batch callers can receive each response's text as it arrives (on_partial)
+- an offline FakeGeminiClient so client reuse, prompts and token savings can be checked without the API
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_BACKEND,
+    GEMINI_CONTEXT_CACHE_ENABLED,
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+    GEMINI_HTTP_POOL_SIZE,
+    GEMINI_RETRY_BACKOFF_SECONDS,
+    GEMINI_STREAMING_ENABLED,
+    get_model_name,
+)
+from tools.cache import fingerprint
+from tools.rate_limiter import estimate_tokens, get_limiter
+
+
+# ---------------------------------------------------------------------------
+# Offline stand-in backend
+# ---------------------------------------------------------------------------
+
+FAKE_STREAM_CHUNKS = 8
+
+class FakeResponse:
+    """Minimal generate_content response: .text, .candidates and .usage_metadata."""
+
+    def __init__(self, text: str = "", candidates: Optional[List[Any]] = None, usage_metadata: Any = None):
+        self.text = text
+        self.candidates = candidates or []
+        self.usage_metadata = usage_metadata
+
+
+class FakeAPIError(Exception):
+    """Shaped like google.genai.errors.APIError: `code` (HTTP status) and `status` (RPC status)."""
+
+    def __init__(self, code: int, status: str, message: str):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._client = client
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        self._client.calls.append({"model": model, "contents": contents, "config": config})
+        cached = (config or {}).get("cached_content") if isinstance(config, dict) else None
+        if cached and cached not in self._client.live_caches():
+            raise FakeAPIError(404, "NOT_FOUND", f"CachedContent not found: {cached}")
+        result = self._client.responder(model, contents, config)
+        return result if isinstance(result, FakeResponse) else FakeResponse(str(result or ""))
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._sync = _FakeModels(client)
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        # Responders may block (e.g. to simulate latency); keep the loop free like a real network call.
+        return await asyncio.to_thread(self._sync.generate_content, model, contents, config)
+
+    async def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Any:
+        """Same as generate_content, delivered as a few text chunks like the real stream."""
+        response = await self.generate_content(model, contents, config)
+
+        async def _chunks() -> Any:
+            text = response.text or ""
+            size = max(1, len(text) // FAKE_STREAM_CHUNKS + 1)
+            for i in range(0, len(text), size):
+                await asyncio.sleep(0)
+                yield FakeResponse(text[i:i + size])
+
+        return _chunks()
+
+
+class _FakeAio:
+    def __init__(self, client: "FakeGeminiClient"):
+        self.models = _FakeAsyncModels(client)
+
+
+class _FakeCachedContent:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class _FakeCaches:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._client = client
+
+    def create(self, model: str, config: Any = None) -> _FakeCachedContent:
+        cache = _FakeCachedContent(f"cachedContents/fake-{len(self._client.cache_uploads) + 1}")
+        self._client.cache_uploads.append({"model": model, "config": config, "name": cache.name})
+        return cache
+
+    def delete(self, name: str, config: Any = None) -> None:
+        if name not in self._client.live_caches():
+            raise FakeAPIError(404, "NOT_FOUND", f"CachedContent not found: {name}")
+        self._client.cache_deletes.append(name)
+
+
+class FakeGeminiClient:
+    """
+    Drop-in for genai.Client used when GEMINI_BACKEND=fake or installed via use_fake_backend().
+    `responder(model, contents, config)` returns the response text (or a FakeResponse);
+    every call is recorded in `calls`, every cached-content upload in `cache_uploads` and
+    every deletion in `cache_deletes`. Requests naming a deleted cache fail with a 404.
+    """
+
+    def __init__(self, responder: Optional[Callable[[str, Any, Any], Any]] = None):
+        self.responder = responder or (lambda model, contents, config: "[]")
+        self.calls: List[dict] = []
+        self.cache_uploads: List[dict] = []
+        self.cache_deletes: List[str] = []
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+        self.caches = _FakeCaches(self)
+
+    def live_caches(self) -> List[str]:
+        return [u["name"] for u in self.cache_uploads if u["name"] not in self.cache_deletes]
+
+    def uploaded_tokens(self) -> int:
+        """Estimated prompt tokens sent so far: inline contents plus cached-content uploads."""
+        total = sum(estimate_tokens(str(c["contents"])) for c in self.calls)
+        for upload in self.cache_uploads:
+            contents = (upload["config"] or {}).get("contents") or []
+            total += sum(estimate_tokens(str(x)) for x in contents)
+        return total
+
+
+# ---------------------------------------------------------------------------
+# Shared client
+# ---------------------------------------------------------------------------
+
+_client: Any = None
+_client_factory: Optional[Callable[[], Any]] = None
+_client_lock = threading.Lock()
+_client_creations = 0
+
+
+def _create_google_client() -> Any:
+    from google import genai
+    from google.genai import types
+
+    http_options = None
+    try:
+        import httpx
+        limits = httpx.Limits(
+            max_connections=GEMINI_HTTP_POOL_SIZE,
+            max_keepalive_connections=GEMINI_HTTP_POOL_SIZE,
+        )
+        http_options = types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+    except Exception as e:
+        # Older SDKs don't accept client_args; the default transport still keeps connections alive.
+        print(f"[LLM] Using default HTTP transport ({str(e)[:80]})", flush=True)
+    return genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+
+
+def _default_factory() -> Any:
+    if GEMINI_BACKEND == "fake":
+        return FakeGeminiClient()
+    return _create_google_client()
+
+
+def get_client() -> Any:
+    """Return the shared Gemini client, creating it on first use."""
+    global _client, _client_creations
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            _client = (_client_factory or _default_factory)()
+            _client_creations += 1
+        return _client
+
+
+def client_creations() -> int:
+    """How many clients this process has built (stays at 1 while the shared client is reused)."""
+    return _client_creations
+
+
+def set_client_factory(factory: Optional[Callable[[], Any]]) -> None:
+    """Install a client factory (None restores the default) and drop the cached client."""
+    global _client, _client_factory
+    with _client_lock:
+        _client_factory = factory
+        _client = None
+
+
+def use_fake_backend(responder: Optional[Callable[[str, Any, Any], Any]] = None) -> FakeGeminiClient:
+    """Route all gateway calls to a FakeGeminiClient and return it for inspection."""
+    fake = FakeGeminiClient(responder)
+    set_client_factory(lambda: fake)
+    return fake
+
+
+# ---------------------------------------------------------------------------
+# Calls
+# ---------------------------------------------------------------------------
+
+def _usage_tokens(response: Any) -> Optional[int]:
+    """Total tokens billed for a response, if the SDK reported usage metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None) if usage is not None else None
+    return int(total) if isinstance(total, int) else None
+
+
+def _is_fake() -> bool:
+    return isinstance(get_client(), FakeGeminiClient)
+
+
+def _make_config(**kwargs: Any) -> Any:
+    """GenerateContentConfig for the real SDK; a plain dict for the fake backend."""
+    if _is_fake():
+        return kwargs
+    from google.genai import types
+    return types.GenerateContentConfig(**kwargs)
+
+
+def _search_tools() -> List[Any]:
+    if _is_fake():
+        return [{"google_search": {}}]
+    from google.genai import types
+    return [types.Tool(google_search=types.GoogleSearch())]
+
+
+def _search_config() -> Any:
+    return _make_config(tools=_search_tools())
+
+
+# ---------------------------------------------------------------------------
+# Explicit context caching (candidate profile)
+# ---------------------------------------------------------------------------
+
+def _create_cached_content(text: str, model: str, use_search_grounding: bool) -> Optional[str]:
+    """Upload `text` as cached content for `model`; returns its name, or None if caching failed."""
+    ttl = f"{GEMINI_CONTEXT_CACHE_TTL_SECONDS}s"
+    tools = _search_tools() if use_search_grounding else None
+    if _is_fake():
+        cfg: Any = {"contents": [text], "ttl": ttl, "tools": tools}
+    else:
+        from google.genai import types
+        cfg = types.CreateCachedContentConfig(
+            contents=[text],
+            ttl=ttl,
+            display_name="joblens-candidate-profile",
+            tools=tools,
+        )
+    estimated = estimate_tokens(text)
+    get_limiter(model).acquire(estimated)
+    try:
+        cache = get_client().caches.create(model=model, config=cfg)
+        print(f"[LLM] Cached candidate profile (~{estimated:,} tokens) as {cache.name}", flush=True)
+        return cache.name
+    except Exception as e:
+        print(f"[LLM] Context caching unavailable, sending profile inline: {str(e)[:120]}", flush=True)
+        return None
+
+
+def _delete_cached_content(name: str) -> None:
+    try:
+        get_client().caches.delete(name=name)
+        print(f"[LLM] Deleted cached candidate profile {name}", flush=True)
+    except Exception as e:
+        # Already gone or unreachable; the server-side TTL removes it either way
+        print(f"[LLM] Could not delete cached content {name}: {str(e)[:120]}", flush=True)
+
+
+def _is_cached_content_error(e: Exception) -> bool:
+    """True if a request failed because its cached content is missing, expired or invalid."""
+    code = getattr(e, "code", None)
+    status = str(getattr(e, "status", "") or "")
+    message = str(e)
+    if code == 404 or status == "NOT_FOUND":
+        return True
+    mentions_cache = "cachedcontent" in message.lower().replace("_", "").replace(" ", "")
+    return mentions_cache and (code == 400 or "INVALID_ARGUMENT" in status or "INVALID_ARGUMENT" in message)
+
+
+class ProfileContext:
+    """
+    The candidate profile block (resume + cover letter) shared by every prompt in a run.
+    It is uploaded once per (model, search tools) pair as Gemini cached content; prompts
+    then reference the handle. If the profile is below the caching minimum, caching is
+    disabled, or the request uses another model, the text is prepended inline instead.
+    Cached content cannot be combined with per-request tools, so search-grounded calls
+    use a separate handle that carries the search tool.
+    Runs bracket their use with retain() / release(); when the last run releases it, the
+    uploaded caches are deleted instead of being left to bill storage until their TTL.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._handles: Dict[Tuple[str, bool], Tuple[Optional[str], float]] = {}
+        self._runs = 0
+        self._lock = threading.Lock()
+
+    def cacheable(self, model: str) -> bool:
+        return (
+            GEMINI_CONTEXT_CACHE_ENABLED
+            and model == get_model_name()
+            and estimate_tokens(self.text) >= GEMINI_CONTEXT_CACHE_MIN_TOKENS
+        )
+
+    def cached_name(self, model: str, use_search_grounding: bool) -> Optional[str]:
+        """Cached-content name for this profile, creating (or refreshing) it if needed."""
+        if not self.cacheable(model):
+            return None
+        key = (model, use_search_grounding)
+        with self._lock:
+            entry = self._handles.get(key)
+            # Refresh a minute before the server-side TTL runs out
+            if entry is not None and time.time() < entry[1] - 60:
+                return entry[0]
+            name = _create_cached_content(self.text, model, use_search_grounding)
+            self._handles[key] = (name, time.time() + GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+            return name
+
+    def invalidate(self, name: str) -> None:
+        with self._lock:
+            for key, (handle, _) in list(self._handles.items()):
+                if handle == name:
+                    del self._handles[key]
+
+    def retain(self) -> None:
+        with self._lock:
+            self._runs += 1
+
+    def release(self) -> None:
+        """End one run's use; the last release deletes the uploaded caches."""
+        with self._lock:
+            self._runs = max(0, self._runs - 1)
+            if self._runs:
+                return
+            names = [name for name, _ in self._handles.values() if name]
+            self._handles.clear()
+        for name in names:
+            _delete_cached_content(name)
+
+
+_PROFILE_CONTEXTS_MAX = 64
+_profile_contexts: "OrderedDict[str, ProfileContext]" = OrderedDict()
+_profile_contexts_lock = threading.Lock()
+
+
+def get_profile_context(text: str) -> ProfileContext:
+    """ProfileContext for this exact profile text (shared by concurrent runs with the same profile)."""
+    key = fingerprint(text)
+    with _profile_contexts_lock:
+        ctx = _profile_contexts.get(key)
+        if ctx is None:
+            ctx = ProfileContext(text)
+            _profile_contexts[key] = ctx
+        _profile_contexts.move_to_end(key)
+        while len(_profile_contexts) > _PROFILE_CONTEXTS_MAX:
+            _profile_contexts.popitem(last=False)
+        return ctx
+
+
+def _json_output(response_schema: Optional[Any], use_search_grounding: bool) -> Dict[str, Any]:
+    """
+    Config fields for structured JSON output. Search grounding cannot be combined with a
+    response schema, so grounded calls rely on the prompt asking for JSON instead.
+    """
+    if response_schema is None or use_search_grounding:
+        return {}
+    return {"response_mime_type": "application/json", "response_schema": response_schema}
+
+
+def _prepare_request(
+    prompt: str,
+    model: str,
+    use_search_grounding: bool,
+    config: Optional[Any],
+    context: Optional[ProfileContext],
+    response_schema: Optional[Any] = None,
+) -> Tuple[str, Any, Optional[str]]:
+    """Return (contents, config, cached_content_name) for one attempt."""
+    json_output = _json_output(response_schema, use_search_grounding)
+    if context is not None and config is None:
+        name = context.cached_name(model, use_search_grounding)
+        if name:
+            return prompt, _make_config(cached_content=name, **json_output), name
+    contents = f"{context.text}\n\n{prompt}" if context is not None else prompt
+    cfg = config
+    if not cfg and use_search_grounding:
+        cfg = _search_config()
+    elif not cfg and json_output:
+        cfg = _make_config(**json_output)
+    return contents, cfg, None
+
+
+def generate_content(prompt: str, model: Optional[str] = None, config: Optional[Any] = None) -> Any:
+    """One generate_content call on the shared client, gated by the rate limiter for `model`."""
+    model = model or get_model_name()
+    limiter = get_limiter(model)
+    estimated = estimate_tokens(prompt)
+    limiter.acquire(estimated)
+    r = get_client().models.generate_content(model=model, contents=prompt, config=config)
+    limiter.reconcile(estimated, _usage_tokens(r))
+    return r
+
+
+def generate_text(
+    prompt: str,
+    max_attempts: int = 3,
+    use_search_grounding: bool = False,
+    config: Optional[Any] = None,
+    context: Optional[ProfileContext] = None,
+    response_schema: Optional[Any] = None,
+) -> str:
+    """
+    Generate text with retries. 429s back off exponentially; the final attempt
+    switches to the fallback model. `context` supplies the shared candidate profile
+    (as cached content when possible); `response_schema` requests JSON output matching it.
+    Returns "" if every attempt fails.
+    """
+    for attempt in range(max_attempts):
+        cached_name = None
+        try:
+            model = get_model_name(use_fallback=attempt >= 2)
+            contents, cfg, cached_name = _prepare_request(
+                prompt, model, use_search_grounding, config, context, response_schema
+            )
+            r = generate_content(contents, model=model, config=cfg)
+            return r.text or ""
+        except Exception as e:
+            if cached_name and context is not None and _is_cached_content_error(e):
+                # Expired or deleted server-side; the next attempt uploads a fresh cache
+                context.invalidate(cached_name)
+            if "429" in str(e) and attempt < max_attempts - 1:
+                time.sleep(GEMINI_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+            elif attempt == max_attempts - 1:
+                print(f"[LLM] Gemini failed: {str(e)[:120]}", flush=True)
+            else:
+                time.sleep(GEMINI_RETRY_BACKOFF_SECONDS)
+    return ""
+
+
+# ---------------------------------------------------------------------------
+# Async calls and concurrent batch dispatch
+# ---------------------------------------------------------------------------
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the gateway's background event loop, starting its thread on first use.
+    All async Gemini calls run on this one loop so the client's async connection
+    pool stays bound to a single loop across graph nodes and runs.
+    """
+    global _loop
+    if _loop is not None:
+        return _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-gateway-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def run_coroutine(coro: Any) -> Any:
+    """Run a coroutine on the gateway loop from synchronous code and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+async def generate_content_async(prompt: str, model: Optional[str] = None, config: Optional[Any] = None) -> Any:
+    """Async generate_content on the shared client, gated by the rate limiter for `model`."""
+    model = model or get_model_name()
+    limiter = get_limiter(model)
+    estimated = estimate_tokens(prompt)
+    await limiter.acquire_async(estimated)
+    r = await get_client().aio.models.generate_content(model=model, contents=prompt, config=config)
+    limiter.reconcile(estimated, _usage_tokens(r))
+    return r
+
+
+def _notify_text(on_text: Callable[[str], None], text: str) -> None:
+    try:
+        on_text(text)
+    except Exception as e:
+        print(f"[LLM] on_text callback failed: {e}", flush=True)
+
+
+async def generate_content_stream_async(
+    prompt: str,
+    model: Optional[str] = None,
+    config: Optional[Any] = None,
+    on_text: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Streamed generate_content on the shared client. `on_text(text_so_far)` is called
+    after every chunk; returns the full text. Rate limited like generate_content_async.
+    """
+    model = model or get_model_name()
+    limiter = get_limiter(model)
+    estimated = estimate_tokens(prompt)
+    await limiter.acquire_async(estimated)
+    text, usage = "", None
+    stream = await get_client().aio.models.generate_content_stream(model=model, contents=prompt, config=config)
+    async for chunk in stream:
+        usage = _usage_tokens(chunk) or usage
+        piece = getattr(chunk, "text", None) or ""
+        if not piece:
+            continue
+        text += piece
+        if on_text:
+            _notify_text(on_text, text)
+    limiter.reconcile(estimated, usage)
+    return text
+
+
+async def generate_text_async(
+    prompt: str,
+    max_attempts: int = 3,
+    use_search_grounding: bool = False,
+    config: Optional[Any] = None,
+    context: Optional[ProfileContext] = None,
+    response_schema: Optional[Any] = None,
+    on_text: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Async counterpart of generate_text with the same retry, fallback, context and schema handling.
+    With `on_text`, the response is streamed and `on_text(text_so_far)` fires per chunk
+    (a retry starts the text over, so it may shrink between calls).
+    """
+    for attempt in range(max_attempts):
+        cached_name = None
+        try:
+            model = get_model_name(use_fallback=attempt >= 2)
+            # Cache creation is a blocking SDK call guarded by a lock; keep it off the loop
+            contents, cfg, cached_name = await asyncio.to_thread(
+                _prepare_request, prompt, model, use_search_grounding, config, context, response_schema
+            )
+            if on_text and GEMINI_STREAMING_ENABLED:
+                return await generate_content_stream_async(contents, model=model, config=cfg, on_text=on_text)
+            r = await generate_content_async(contents, model=model, config=cfg)
+            text = r.text or ""
+            if on_text and text:
+                _notify_text(on_text, text)
+            return text
+        except Exception as e:
+            if cached_name and context is not None and _is_cached_content_error(e):
+                # Expired or deleted server-side; the next attempt uploads a fresh cache
+                context.invalidate(cached_name)
+            if "429" in str(e) and attempt < max_attempts - 1:
+                await asyncio.sleep(GEMINI_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+            elif attempt == max_attempts - 1:
+                print(f"[LLM] Gemini failed: {str(e)[:120]}", flush=True)
+            else:
+                await asyncio.sleep(GEMINI_RETRY_BACKOFF_SECONDS)
+    return ""
+
+
+def generate_text_batch(
+    prompts: List[str],
+    use_search_grounding: bool = False,
+    config: Optional[Any] = None,
+    on_result: Optional[Callable[[int, str], None]] = None,
+    context: Optional[ProfileContext] = None,
+    response_schema: Optional[Any] = None,
+    on_partial: Optional[Callable[[int, str], None]] = None,
+) -> List[str]:
+    """
+    Send all prompts concurrently (under the shared rate limit) and return their
+    texts in input order. `on_result(index, text)` fires as each one completes;
+    `on_partial(index, text_so_far)` streams the responses and fires per chunk.
+    Callbacks run on the gateway loop thread, one at a time, and stall every in-flight
+    request while they do: keep them to in-memory work, and do blocking I/O (job-store
+    writes, logging to the job) on the caller's thread after this returns.
+    """
+    if not prompts:
+        return []
+
+    async def _one(i: int, prompt: str) -> str:
+        text = await generate_text_async(
+            prompt,
+            use_search_grounding=use_search_grounding,
+            config=config,
+            context=context,
+            response_schema=response_schema,
+            on_text=(lambda text: on_partial(i, text)) if on_partial else None,
+        )
+        if on_result:
+            try:
+                on_result(i, text)
+            except Exception as e:
+                print(f"[LLM] on_result callback failed: {e}", flush=True)
+        return text
+
+    async def _all() -> List[str]:
+        return list(await asyncio.gather(*(_one(i, p) for i, p in enumerate(prompts))))
+
+    return run_coroutine(_all())
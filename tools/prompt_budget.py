@@ -0,0 +1,157 @@
+"""
+Prompt Budget Tool
+Purpose: Keep job descriptions (and the candidate profile) inside a token budget
+instead of slicing them at fixed character offsets.
+Uses: Heading-based section detection — requirement-bearing sections (responsibilities,
+qualifications, skills) are kept first and verbatim, boilerplate sections (EEO statements,
+benefits, perks, application notices) are dropped, boilerplate sentences are removed from
+the remaining unheaded / unclassified text, and whatever still exceeds the budget is cut
+at a sentence boundary.
+Input: Raw description text(s) and a token budget
+Output: Compacted text(s) whose estimated size fits the budget
+"""
+
+import re
+from typing import List, Sequence
+
+CHARS_PER_TOKEN = 4  # same ratio as tools.rate_limiter.estimate_tokens
+
+
+# ---------------------------------------------------------------------------
+# Section classification
+# ---------------------------------------------------------------------------
+
+_REQUIREMENT_HEADINGS = re.compile(
+    r"\b(requirements?|qualifications?|responsibilit(y|ies)|duties|what you.?ll (do|bring|need)|"
+    r"what we.?re looking for|who you are|you have|you will|must.haves?|nice.to.haves?|"
+    r"preferred|skills|experience|about the role|the role|role overview|job description|"
+    r"key (tasks|accountabilities)|your impact|in this role)\b",
+    re.IGNORECASE,
+)
+
+_BOILERPLATE_HEADINGS = re.compile(
+    r"\b(benefits?|perks|what we offer|why (join|work)|compensation|salary|pay (range|transparency)|"
+    r"equal (employment )?opportunity|eeo|diversity|inclusion|accommodations?|privacy|"
+    r"how to apply|application process|disclaimer|legal)\b",
+    re.IGNORECASE,
+)
+
+# Boilerplate sentences that show up outside any heading. Only applied to text outside
+# requirement sections, where "dental" or "background check" can be part of the job itself.
+_BOILERPLATE_SENTENCE = re.compile(
+    r"(equal (employment )?opportunity|without regard to|race, colou?r|sexual orientation|gender identity|"
+    r"protected veteran|reasonable accommodations?|e-verify|affirmative action|"
+    r"401\(?k\)?|paid time off|\bpto\b|(medical|dental|vision)(, | and | & |/)*(dental|vision|health)? "
+    r"(insurance|coverage|plans?|benefits)|parental leave|privacy (notice|policy)|"
+    r"(subject to|pass(ing)?|undergo|complete) an? (criminal )?background check|"
+    r"recruitment agencies|unsolicited resumes)",
+    re.IGNORECASE,
+)
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def _heading_text(line: str) -> str:
+    """Heading label if the line looks like a section heading, else ''."""
+    raw = line.strip()
+    if not raw or len(raw) > 80:
+        return ""
+    marked = raw.startswith("#") or (raw.startswith("**") and raw.rstrip(":").endswith("**")) or raw.endswith(":")
+    label = raw.strip("#*_: \t").strip()
+    if not label or len(label.split()) > 8:
+        return ""
+    if marked:
+        return label
+    # Bare heading lines ("Requirements", "Benefits") without markup
+    if _REQUIREMENT_HEADINGS.fullmatch(label) or _BOILERPLATE_HEADINGS.fullmatch(label):
+        return label
+    return ""
+
+
+def _split_sections(text: str) -> List[tuple]:
+    """Split text into (heading, lines) sections; the leading section has heading ''."""
+    sections: List[tuple] = [("", [])]
+    for line in text.splitlines():
+        heading = _heading_text(line)
+        if heading:
+            sections.append((heading, []))
+        elif line.strip():
+            sections[-1][1].append(line.strip())
+    return [(h, lines) for h, lines in sections if lines]
+
+
+def _strip_boilerplate(lines: Sequence[str]) -> List[str]:
+    out = []
+    for line in lines:
+        sentences = [s for s in _SENTENCE_SPLIT.split(line) if s and not _BOILERPLATE_SENTENCE.search(s)]
+        if sentences:
+            out.append(" ".join(sentences))
+    return out
+
+
+def compact_description(text: str) -> str:
+    """
+    Drop boilerplate and move requirement-bearing sections to the front,
+    so any later truncation removes the least useful text first.
+    Requirement sections are kept as written.
+    """
+    text = (text or "").strip()
+    if not text:
+        return ""
+    requirement, other = [], []
+    for heading, lines in _split_sections(text):
+        if heading and _BOILERPLATE_HEADINGS.search(heading) and not _REQUIREMENT_HEADINGS.search(heading):
+            continue
+        is_requirement = bool(heading and _REQUIREMENT_HEADINGS.search(heading))
+        if not is_requirement:
+            lines = _strip_boilerplate(lines)
+        if not lines:
+            continue
+        block = "\n".join(([f"{heading}:"] if heading else []) + lines)
+        (requirement if is_requirement else other).append(block)
+    return "\n".join(requirement + other)
+
+
+# ---------------------------------------------------------------------------
+# Truncation and batch packing
+# ---------------------------------------------------------------------------
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, ending at a sentence or line boundary when one is close."""
+    text = (text or "").strip()
+    max_chars = max(0, int(max_tokens)) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 0:
+        return ""
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "), cut.rfind("\n"))
+    if boundary >= max_chars // 2:
+        lines = cut[:boundary + 1].rstrip().split("\n")
+        # Don't end on a dangling section heading (one with none of its body kept)
+        while lines and _heading_text(lines[-1]):
+            lines.pop()
+        kept = "\n".join(lines).rstrip()
+        if kept:
+            return kept
+        # Nothing but headings before the boundary: cut mid-line instead, keeping some body
+    space = cut.rfind(" ")
+    return (cut[:space] if space >= max_chars // 2 else cut).rstrip() + " …"
+
+
+def pack_descriptions(texts: Sequence[str], batch_tokens: int, job_max_tokens: int) -> List[str]:
+    """
+    Compact each description and share `batch_tokens` across the batch.
+    Short descriptions only take what they need; the leftover goes to longer ones,
+    each capped at `job_max_tokens`. Order of the returned list matches `texts`.
+    """
+    compacted = [compact_description(t) for t in texts]
+    needs = [-(-len(t) // CHARS_PER_TOKEN) for t in compacted]
+    budgets = [0] * len(compacted)
+    remaining = max(0, int(batch_tokens))
+    order = sorted(range(len(compacted)), key=lambda i: needs[i])
+    for pos, i in enumerate(order):
+        share = remaining // (len(order) - pos)
+        budgets[i] = min(needs[i], share, job_max_tokens)
+        remaining -= budgets[i]
+    return [truncate_to_tokens(t, b) if t else "" for t, b in zip(compacted, budgets)]
@@ -0,0 +1,133 @@
+"""
+Rate Limiter Tool
+Purpose: Process-wide Gemini quota enforcement shared by every LLM call site.
+Uses: Two token buckets per model — requests per minute and tokens per minute.
+Callers block (threads) or await (asyncio) only when the bucket has no headroom,
+so bursts up to the configured quota go through without any sleep.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_rate_limits
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for quota accounting (~4 characters per token)."""
+    return max(1, len(text or "") // 4)
+
+
+# ---------------------------------------------------------------------------
+# Token bucket
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills continuously
+    at `capacity / period` tokens per second. Not thread-safe on its own —
+    ModelRateLimiter guards its buckets with a single lock.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(max(1.0, capacity))
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+# ---------------------------------------------------------------------------
+# Per-model limiter (RPM + TPM)
+# ---------------------------------------------------------------------------
+
+class ModelRateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one model, taken atomically."""
+
+    def __init__(self, model: str, rpm: int, tpm: int):
+        self.model = model
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take one request + `tokens` if both buckets have headroom; else return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+            if wait <= 0:
+                self._requests.take(1)
+                self._tokens.take(tokens)
+            return wait
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Block the calling thread until quota is available. Returns total seconds waited."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        """Await until quota is available without blocking the event loop. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def reconcile(self, estimated: int, actual: Optional[int]) -> None:
+        """Correct the TPM bucket once the real token usage of a call is known."""
+        if actual is None or actual == estimated:
+            return
+        with self._lock:
+            if actual < estimated:
+                self._tokens.give_back(estimated - actual)
+            else:
+                self._tokens.take(actual - estimated)
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> ModelRateLimiter:
+    """Return the process-wide limiter for a model, creating it from config on first use."""
+    limiter = _limiters.get(model)
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limits = get_rate_limits(model)
+            limiter = ModelRateLimiter(model, rpm=limits["rpm"], tpm=limits["tpm"])
+            _limiters[model] = limiter
+        return limiter
@@ -0,0 +1,73 @@
+"""
+Local Relevance Tool
+Purpose: Cheap resume-vs-job similarity used to prune obviously irrelevant postings
+before they are sent to Gemini for scoring.
+Uses: Hashed TF-IDF vectors (unigrams + bigrams) and cosine similarity, vectorized with NumPy.
+Input: Resume text and a list of job texts
+Output: One similarity in [0, 1] per job
+"""
+
+import re
+import zlib
+from typing import List
+
+HASH_DIM = 2 ** 15
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9+#.]*[a-z0-9+#]|[a-z]")
+
+_STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being but by can could did do does
+for from had has have having he her his how i if in into is it its just may me more most my
+no not of on one or other our out over own per she should so some such than that the their
+them then there these they this those through to too under up us very was we were what when
+where which while who will with within without would you your
+""".split())
+
+
+def _tokens(text: str) -> List[str]:
+    words = [w for w in _TOKEN_RE.findall((text or "").lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _hashed_counts(text: str) -> dict:
+    counts: dict = {}
+    for tok in _tokens(text):
+        h = zlib.crc32(tok.encode("utf-8")) % HASH_DIM
+        counts[h] = counts.get(h, 0) + 1
+    return counts
+
+
+def similarity_scores(resume_text: str, job_texts: List[str]) -> List[float]:
+    """
+    Cosine similarity between the resume and each job text.
+    IDF is computed over the resume plus this batch of jobs, so terms shared by
+    every posting (boilerplate) weigh little.
+    """
+    if not job_texts:
+        return []
+    import numpy as np
+
+    docs = [_hashed_counts(resume_text)] + [_hashed_counts(t) for t in job_texts]
+    matrix = np.zeros((len(docs), HASH_DIM), dtype=np.float32)
+    for row, counts in enumerate(docs):
+        if counts:
+            cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            matrix[row, cols] = 1.0 + np.log(tf)
+
+    df = np.count_nonzero(matrix, axis=0).astype(np.float32)
+    idf = np.log((len(docs) + 1.0) / (df + 1.0)) + 1.0
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    matrix /= norms[:, None]
+
+    sims = matrix[1:] @ matrix[0]
+    return [float(max(0.0, min(1.0, s))) for s in sims]
+
+
+def job_text(job: dict) -> str:
+    """Text used to represent a posting for similarity (title weighted by repetition)."""
+    title = job.get("title") or ""
+    return f"{title} {title} {job.get('description') or ''}"
+
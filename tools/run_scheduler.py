@@ -0,0 +1,167 @@
+"""
+Run Scheduler Tool
+Purpose: Admission control for API workflow runs.
+Uses: A fixed pool of worker threads fed by a priority queue (FIFO within a priority).
+The queue is bounded; callers get QueueFull with a Retry-After estimate instead of
+spawning more threads. shutdown() stops admissions and drains what is already queued.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class QueueFull(Exception):
+    """Raised by submit() when the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Run queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RunScheduler:
+    """
+    Args:
+        workers:     Runs executed concurrently
+        max_queue:   Runs allowed to wait (beyond those executing) before submit() refuses
+        on_queue_change: Called with {job_id: 1-based position} for every run still waiting
+                     for a worker after the queue changes (outside the lock), so callers can
+                     publish positions. Runs an idle worker is about to start are left out.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        on_queue_change: Optional[Callable[[Dict[str, int]], None]] = None,
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.on_queue_change = on_queue_change
+        self._heap: List[Tuple[int, int, str, Callable[..., Any], tuple]] = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, float] = {}  # job_id -> start time
+        self._accepting = True
+        self._avg_run_seconds = 120.0  # refined from completed runs
+
+    # -- submission ----------------------------------------------------------
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"run-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up."""
+        with self._cond:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self) -> int:
+        waves = (len(self._heap) // self.workers) + 1
+        return max(1, int(self._avg_run_seconds * waves / 2))
+
+    def _full_locked(self) -> bool:
+        # Runs an idle worker is about to pick up don't count as waiting
+        idle = self.workers - len(self._running)
+        return not self._accepting or len(self._heap) - max(0, idle) >= self.max_queue
+
+    def is_full(self) -> bool:
+        with self._cond:
+            return self._full_locked()
+
+    def submit(self, job_id: str, fn: Callable[..., Any], *args: Any, priority: int = 0) -> int:
+        """
+        Queue fn(*args) under job_id (lower priority value runs first). Returns the run's
+        1-based queue position, or 0 if a worker picks it up immediately.
+        """
+        with self._cond:
+            if self._full_locked():
+                raise QueueFull(self._retry_after_locked())
+            heapq.heappush(self._heap, (priority, next(self._order), job_id, fn, args))
+            self._start_workers()
+            positions = self._positions_locked()
+            self._cond.notify()
+        self._publish(positions)
+        return positions.get(job_id, 0)
+
+    # -- queue state -----------------------------------------------------------
+
+    def _positions_locked(self) -> Dict[str, int]:
+        # The first `idle` entries are about to be picked up by idle workers, so they aren't
+        # really queued; positions count from the first run that will actually wait
+        idle = max(0, self.workers - len(self._running))
+        return {entry[2]: i + 1 for i, entry in enumerate(sorted(self._heap)[idle:])}
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting run, or None if it is not waiting here (or about to start)."""
+        with self._cond:
+            return self._positions_locked().get(job_id)
+
+    def running_jobs(self) -> List[str]:
+        with self._cond:
+            return list(self._running)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "queued": len(self._heap),
+                "max_queue": self.max_queue,
+                "accepting": self._accepting,
+            }
+
+    def _publish(self, positions: Dict[str, int]) -> None:
+        if self.on_queue_change and positions:
+            try:
+                self.on_queue_change(positions)
+            except Exception as e:
+                print(f"[SCHED] on_queue_change failed: {e}", flush=True)
+
+    # -- workers ---------------------------------------------------------------
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and self._accepting:
+                    self._cond.wait()
+                if not self._heap:
+                    return  # shutting down and nothing left to drain
+                _, _, job_id, fn, args = heapq.heappop(self._heap)
+                self._running[job_id] = time.monotonic()
+                positions = self._positions_locked()
+            self._publish(positions)
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[SCHED] Run {job_id} failed: {e}", flush=True)
+            finally:
+                with self._cond:
+                    started = self._running.pop(job_id, None)
+                    if started is not None:
+                        self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * (time.monotonic() - started)
+                    self._cond.notify_all()
+
+    def shutdown(self, timeout: Optional[float] = None) -> List[str]:
+        """
+        Stop accepting runs and wait (up to timeout seconds) for queued and running ones
+        to finish. Returns the job_ids still queued when the timeout hit; they are dropped.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._accepting = False
+            self._cond.notify_all()
+            while self._heap or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            dropped = [entry[2] for entry in sorted(self._heap)]
+            self._heap.clear()
+            self._cond.notify_all()
+        return dropped
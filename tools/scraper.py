@@ -4,15 +4,39 @@ Purpose: Extract structured job listings from LinkedIn
 Uses: JobSpy — free open-source scraper, no API key required
 Input: List of job titles, max jobs to return, pagination offset, sort mode
 Output: List of jobs with title, company, location, description, url, salary, source
+
+Pagination: each (search_term, hours_old, location) keeps a cursor of the postings
+already fetched, so later pages only fetch the rows past the cursor instead of
+re-downloading every earlier page. The cursor counts raw JobSpy rows separately from
+the deduplicated postings, because JobSpy's offset is in rows (and LinkedIn rounds it
+down to a multiple of 10).
+
+Cross-run cache: postings (by URL) and each search's ordered URL list are persisted
+in the local SQLite cache (tools.cache), so repeated and concurrent runs for popular
+titles are served without calling JobSpy again until the TTL expires.
 """
 
 import sys
 import os
-from typing import Dict, List, Literal, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Literal, Optional, Tuple
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from jobspy import scrape_jobs as _jobspy_scrape
+from config import (
+    SCRAPE_CACHE_ENABLED,
+    SCRAPE_DESCRIPTION_MAX_CHARS,
+    SCRAPE_POSTING_MAX_ENTRIES,
+    SCRAPE_POSTING_TTL_SECONDS,
+    SCRAPE_SEARCH_MAX_ENTRIES,
+    SCRAPE_SEARCH_TTL_SECONDS,
+)
+from tools.cache import PersistentCache
+
+_posting_cache = PersistentCache("scraped_postings", SCRAPE_POSTING_TTL_SECONDS, SCRAPE_POSTING_MAX_ENTRIES)
+_search_cache = PersistentCache("scraped_searches", SCRAPE_SEARCH_TTL_SECONDS, SCRAPE_SEARCH_MAX_ENTRIES)
 
 
 # ---------------------------------------------------------------------------
@@ -34,6 +58,190 @@ def _format_salary(row) -> str:
     return ""
 
 
+# ---------------------------------------------------------------------------
+# Row normalization
+# ---------------------------------------------------------------------------
+
+def _normalize_row(row) -> Dict:
+    """Convert one JobSpy DataFrame row to our job dict shape."""
+    desc = str(row.get("description") or "")
+
+    city  = str(row.get("city")  or "").strip()
+    state = str(row.get("state") or "").strip()
+    location = f"{city}, {state}".strip(", ") if city or state else str(row.get("location") or "")
+
+    posted_at = ""
+    raw_date = row.get("date_posted") or row.get("DATE_POSTED")
+    if raw_date is not None:
+        try:
+            posted_at = raw_date.isoformat() if hasattr(raw_date, "isoformat") else (raw_date.strftime("%Y-%m-%dT%H:%M:%S") if hasattr(raw_date, "strftime") else str(raw_date))
+        except Exception:
+            posted_at = str(raw_date)
+
+    posted_display = None
+    for key in ("posted_ago", "posted_display", "posted"):
+        val = row.get(key)
+        if isinstance(val, str) and val.strip():
+            posted_display = val.strip()
+            break
+
+    return {
+        "title":       row.get("title"),
+        "company":     row.get("company"),
+        "location":    location,
+        "description": desc[:SCRAPE_DESCRIPTION_MAX_CHARS] if desc else None,
+        "salary":      _format_salary(row),
+        "url":         row.get("job_url"),
+        "source":      "linkedin",
+        "posted_at":   posted_at or None,
+        "posted_display": posted_display,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Search cursors (per-search page cache)
+# ---------------------------------------------------------------------------
+
+SEARCH_CURSOR_TTL_SECONDS = 30 * 60
+SEARCH_CURSOR_MAX_ENTRIES = 64
+
+SearchKey = Tuple[str, int, str]
+
+JOBSPY_PAGE_ROWS = 10  # JobSpy's LinkedIn scraper starts at offset // 10 * 10
+ADVANCE_MAX_REQUESTS = 3  # JobSpy calls per page when duplicates leave it short
+
+
+class _SearchCursor:
+    """Postings fetched so far for one search, in result order."""
+
+    def __init__(self):
+        self.jobs: List[Dict] = []
+        self.urls: set = set()
+        self.rows_consumed = 0  # JobSpy rows read, including duplicates; the next request's offset
+        self.exhausted = False
+        self.created = time.time()
+        self.lock = threading.Lock()
+
+    def expired(self) -> bool:
+        return time.time() - self.created > SEARCH_CURSOR_TTL_SECONDS
+
+
+_cursors: "OrderedDict[SearchKey, _SearchCursor]" = OrderedDict()
+_cursors_lock = threading.Lock()
+
+
+def _get_cursor(key: SearchKey) -> _SearchCursor:
+    """Return the live cursor for a search, creating it (and evicting old ones) as needed."""
+    with _cursors_lock:
+        cursor = _cursors.get(key)
+        if cursor is None or cursor.expired():
+            cursor = _SearchCursor()
+            _cursors[key] = cursor
+        _cursors.move_to_end(key)
+        while len(_cursors) > SEARCH_CURSOR_MAX_ENTRIES:
+            _cursors.popitem(last=False)
+        return cursor
+
+
+def _fetch_rows(search_term: str, location: str, hours_old: int, offset: int, count: int):
+    """One JobSpy request for `count` postings starting at `offset`. Returns a DataFrame or None on error."""
+    # Deferred: jobspy pulls in pandas, which dominates import time. Outside the try so a
+    # missing package fails loudly instead of looking like an empty search.
+    from jobspy import scrape_jobs
+
+    try:
+        return scrape_jobs(
+            site_name=["linkedin"],
+            search_term=search_term,
+            location=location,
+            results_wanted=count,
+            hours_old=hours_old,
+            linkedin_fetch_description=True,
+            offset=offset,
+            verbose=0,
+        )
+    except Exception as e:
+        print(f"[SCRAPER] JobSpy error: {e}", flush=True)
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def _search_cache_key(key: SearchKey) -> str:
+    search_term, hours_old, location = key
+    return f"{search_term}|{hours_old}|{location}"
+
+
+def _extend_from_cache(cursor: _SearchCursor, key: SearchKey) -> None:
+    """Append postings another run (or process) already fetched for this search."""
+    entry = _search_cache.get(_search_cache_key(key))
+    if not entry:
+        return
+    urls = entry.get("urls") or []
+    for url in urls[len(cursor.jobs):]:
+        job = _posting_cache.get(url)
+        if job is None:
+            # Only a contiguous prefix is usable; the rest is fetched from JobSpy.
+            return
+        if url not in cursor.urls:
+            cursor.urls.add(url)
+            cursor.jobs.append(job)
+    cursor.rows_consumed = max(cursor.rows_consumed, entry.get("rows_consumed") or len(urls))
+    if entry.get("exhausted"):
+        cursor.exhausted = True
+
+
+def _persist_cursor(cursor: _SearchCursor, key: SearchKey, new_jobs: List[Dict]) -> None:
+    for job in new_jobs:
+        if job.get("url"):
+            _posting_cache.set(job["url"], job)
+    _search_cache.set(_search_cache_key(key), {
+        "urls": [j.get("url") for j in cursor.jobs if j.get("url")],
+        "rows_consumed": cursor.rows_consumed,
+        "exhausted": cursor.exhausted,
+    })
+
+
+def _advance_cursor(cursor: _SearchCursor, key: SearchKey, needed: int) -> int:
+    """
+    Fetch only the postings past the cursor until it holds `needed` rows or the search runs dry.
+    Duplicate rows don't count towards `needed`, so a short request is topped up (at most
+    ADVANCE_MAX_REQUESTS JobSpy calls). Returns how many postings were newly fetched from JobSpy.
+    """
+    search_term, hours_old, location = key
+    if len(cursor.jobs) < needed and not cursor.exhausted and SCRAPE_CACHE_ENABLED:
+        _extend_from_cache(cursor, key)
+    new_jobs: List[Dict] = []
+    for _ in range(ADVANCE_MAX_REQUESTS):
+        missing = needed - len(cursor.jobs)
+        if missing <= 0 or cursor.exhausted:
+            break
+        # Ask for the aligned page JobSpy will actually start from and skip the rows already read
+        offset = cursor.rows_consumed - cursor.rows_consumed % JOBSPY_PAGE_ROWS
+        skip = cursor.rows_consumed - offset
+        df = _fetch_rows(search_term, location, hours_old, offset=offset, count=missing + skip)
+        if df is None:
+            break
+        if df.empty or len(df) < missing + skip:
+            cursor.exhausted = True
+        cursor.rows_consumed = max(cursor.rows_consumed, offset + len(df))
+        for i, (_, row) in enumerate(df.iterrows()):
+            if i < skip:
+                continue
+            job = _normalize_row(row)
+            url = job.get("url")
+            if url and url in cursor.urls:
+                continue
+            if url:
+                cursor.urls.add(url)
+            cursor.jobs.append(job)
+            new_jobs.append(job)
+            print(f"[SCRAPER] (+{len(cursor.jobs)}) {job.get('title')} @ {job.get('company')}", flush=True)
+    if SCRAPE_CACHE_ENABLED and (new_jobs or cursor.exhausted):
+        _persist_cursor(cursor, key, new_jobs)
+    return len(new_jobs)
+
+
 # ---------------------------------------------------------------------------
 # Public entry point
 # ---------------------------------------------------------------------------
@@ -67,67 +275,19 @@ def scrape_jobs(
         search_term = f"({search_term}) {kw_str}"
 
     hours_old = 72 if sort_by == "recent" else 168
+    location = "United States"
 
     print(f"[SCRAPER] JobSpy LinkedIn search: {search_term} | mode={sort_by} hours_old={hours_old} (offset={start_offset})", flush=True)
 
-    try:
-        df = _jobspy_scrape(
-            site_name=["linkedin"],
-            search_term=search_term,
-            location="United States",
-            results_wanted=max_jobs + start_offset,
-            hours_old=hours_old,
-            linkedin_fetch_description=True,
-            offset=start_offset,
-            verbose=0,
-        )
-    except Exception as e:
-        print(f"[SCRAPER] JobSpy error: {e}", flush=True)
-        import traceback
-        traceback.print_exc()
-        return []
+    key = (search_term, hours_old, location)
+    cursor = _get_cursor(key)
+    with cursor.lock:
+        fetched = _advance_cursor(cursor, key, start_offset + max_jobs)
+        page = [dict(j) for j in cursor.jobs[start_offset : start_offset + max_jobs]]
 
-    if df is None or df.empty:
+    if not page:
         print("[SCRAPER] No results returned by JobSpy", flush=True)
         return []
 
-    # Slice the requested page: rows [start_offset : start_offset+max_jobs]
-    slice_df = df.iloc[start_offset : start_offset + max_jobs] if start_offset > 0 else df.head(max_jobs)
-    jobs: List[Dict] = []
-    for _, row in slice_df.iterrows():
-        desc = str(row.get("description") or "")
-
-        city  = str(row.get("city")  or "").strip()
-        state = str(row.get("state") or "").strip()
-        location = f"{city}, {state}".strip(", ") if city or state else str(row.get("location") or "")
-
-        posted_at = ""
-        raw_date = row.get("date_posted") or row.get("DATE_POSTED")
-        if raw_date is not None:
-            try:
-                posted_at = raw_date.isoformat() if hasattr(raw_date, "isoformat") else (raw_date.strftime("%Y-%m-%dT%H:%M:%S") if hasattr(raw_date, "strftime") else str(raw_date))
-            except Exception:
-                posted_at = str(raw_date)
-
-        posted_display = None
-        for key in ("posted_ago", "posted_display", "posted"):
-            val = row.get(key)
-            if isinstance(val, str) and val.strip():
-                posted_display = val.strip()
-                break
-
-        jobs.append({
-            "title":       row.get("title"),
-            "company":     row.get("company"),
-            "location":    location,
-            "description": desc[:2000] if desc else None,
-            "salary":      _format_salary(row),
-            "url":         row.get("job_url"),
-            "source":      "linkedin",
-            "posted_at":   posted_at or None,
-            "posted_display": posted_display,
-        })
-        print(f"[SCRAPER] ({len(jobs)}/{max_jobs}) {row.get('title')} @ {row.get('company')}", flush=True)
-
-    print(f"[SCRAPER] Total extracted: {len(jobs)} jobs", flush=True)
-    return jobs
+    print(f"[SCRAPER] Total extracted: {len(page)} jobs ({fetched} newly fetched from JobSpy)", flush=True)
+    return page
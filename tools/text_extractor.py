@@ -2,64 +2,285 @@
 Text Extractor Tool
 Purpose: Extract plain text from uploaded resume/cover letter files.
 Supports: PDF, DOCX, DOC, TXT
+PDFs are tiered: a cheap pass without layout analysis first, then full pdfminer
+LAParams layout only when the cheap text fails validation (too short, run-together words).
+Parsing is CPU-bound; the API runs it off the event loop via tools.extraction_pool.
+Extracted text is cached by SHA-256 of the file bytes (cached_text / store_text). The
+cache is consulted in one place, tools.extraction_pool.extract_text_async, so a
+re-uploaded resume skips parsing entirely.
+Input is either the file's bytes or the path of a spooled upload. Parsers read a spooled
+file through its handle (mmap for sniffing and decoding), and bytes are wrapped without
+copying, so a large upload is not duplicated in memory.
 """
 
+import hashlib
 import io
-from typing import Optional
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
 
+# Bytes-like content the extractors read from (bytes, or an mmap of a spooled upload)
+Buffer = Union[bytes, mmap.mmap]
 
-def extract_text(file_bytes: bytes, filename: str) -> str:
+
+def extract_text(file_bytes: Union[bytes, str], filename: str) -> str:
     """
     Extract plain text from file bytes.
     Routes by file extension first, then falls back to magic-byte detection.
 
     Args:
-        file_bytes: Raw bytes of the uploaded file
+        file_bytes: Raw bytes of the uploaded file, or the path of a spooled upload
         filename: Original filename (used to determine format)
 
     Returns:
         Extracted plain text string
     """
-    name_lower = (filename or "").lower()
+    return extract_text_timed(file_bytes, filename)[0]
 
-    if name_lower.endswith(".pdf") or _is_pdf(file_bytes):
-        return _extract_pdf(file_bytes)
-    elif name_lower.endswith(".docx") or name_lower.endswith(".doc") or _is_docx(file_bytes):
-        return _extract_docx(file_bytes)
+
+def extract_text_timed(file_bytes: Union[bytes, str], filename: str) -> Tuple[str, Dict[str, float]]:
+    """
+    extract_text() plus seconds spent per PDF tier ({"fast": ..., "full": ...}; only tiers
+    that ran, empty for other formats). Returned rather than recorded here because this runs
+    in extraction pool workers.
+    """
+    if isinstance(file_bytes, str):
+        with open(file_bytes, "rb") as stream, open_mapped(file_bytes) as mapped:
+            return _extract_buffer(mapped, filename, stream)
+    # BytesIO shares the bytes object's storage until written to, so this does not copy
+    return _extract_buffer(file_bytes, filename, io.BytesIO(file_bytes))
+
+
+def _extract_buffer(buffer: Buffer, filename: str, stream: BinaryIO) -> Tuple[str, Dict[str, float]]:
+    """buffer is used to sniff the format and decode plain text; parsers read from stream."""
+    fmt = detect_format(buffer, filename)
+    if fmt == "pdf":
+        return _extract_pdf(stream)
+    elif fmt == "docx":
+        return _extract_docx(stream), {}
     else:
-        return file_bytes.decode("utf-8", errors="replace")
+        return str(buffer, "utf-8", errors="replace"), {}
+
+
+@contextmanager
+def open_mapped(path: str) -> Iterator[Buffer]:
+    """Read-only mmap of a file (empty files, which cannot be mapped, yield b"")."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def detect_format(file_bytes: Buffer, filename: str) -> str:
+    """Format extract_text will use: "pdf", "docx" or "text"."""
+    name_lower = (filename or "").lower()
+    if name_lower.endswith(".pdf") or _is_pdf(file_bytes):
+        return "pdf"
+    if name_lower.endswith(".docx") or name_lower.endswith(".doc") or _is_docx(file_bytes):
+        return "docx"
+    return "text"
 
 
-def _is_pdf(file_bytes: bytes) -> bool:
+def _is_pdf(file_bytes: Buffer) -> bool:
     """Detect PDF by magic bytes (%PDF header)."""
     return file_bytes[:4] == b"%PDF"
 
 
-def _is_docx(file_bytes: bytes) -> bool:
+def _is_docx(file_bytes: Buffer) -> bool:
     """Detect DOCX/ZIP by magic bytes (PK header)."""
     return file_bytes[:2] == b"PK"
 
 
-def _extract_pdf(file_bytes: bytes) -> str:
-    """Extract text from PDF bytes using pdfminer.six."""
-    from pdfminer.high_level import extract_text_to_fp
+# ---------------------------------------------------------------------------
+# PDF tiers
+# ---------------------------------------------------------------------------
+
+def _extract_pdf(stream: BinaryIO) -> Tuple[str, Dict[str, float]]:
+    """
+    Cheap no-layout pass first; full LAParams layout analysis of every page if the cheap
+    text fails validation, or if the PDF is longer than EXTRACT_PDF_MAX_PAGES (the fast
+    pass stops there, and its partial text is never returned).
+    """
+    from config import EXTRACT_PDF_FAST_ENABLED, EXTRACT_PDF_FAST_MIN_CHARS_PER_PAGE, EXTRACT_PDF_MAX_PAGES
+
+    timings: Dict[str, float] = {}
+    if EXTRACT_PDF_FAST_ENABLED:
+        start = time.perf_counter()
+        text, pages, complete = _pdf_pass(stream, layout=False, max_pages=EXTRACT_PDF_MAX_PAGES)
+        timings["fast"] = time.perf_counter() - start
+        if complete and _fast_text_usable(text, pages, EXTRACT_PDF_FAST_MIN_CHARS_PER_PAGE):
+            return text, timings
+    start = time.perf_counter()
+    # No page limit: this is the fallback, so it always reads the whole document
+    text, _, _ = _pdf_pass(stream, layout=True, max_pages=0)
+    timings["full"] = time.perf_counter() - start
+    return text, timings
+
+
+def _pdf_pass(stream: BinaryIO, layout: bool, max_pages: int) -> Tuple[str, int, bool]:
+    """
+    One pdfminer pass over at most max_pages pages (0 = all).
+    Returns (text, pages processed, whether every page was processed).
+    layout=True groups characters with the default LAParams (the expensive part of pdfminer);
+    layout=False writes glyphs in content-stream order.
+    """
+    from pdfminer.converter import TextConverter
     from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
 
+    rsrcmgr = PDFResourceManager(caching=True)
     output = io.StringIO()
-    extract_text_to_fp(
-        io.BytesIO(file_bytes),
-        output,
-        laparams=LAParams(),
-        output_type="text",
-        codec="utf-8",
-    )
-    return output.getvalue().strip()
+    if layout:
+        device = TextConverter(rsrcmgr, output, codec="utf-8", laparams=LAParams())
+    else:
+        device = _plain_text_device(rsrcmgr, output)
+    pages = 0
+    complete = True
+    try:
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        stream.seek(0)
+        # One page past the limit is fetched (not processed) to tell whether any remain
+        fetch = max_pages + 1 if max_pages else 0
+        for page in PDFPage.get_pages(stream, maxpages=fetch, check_extractable=False):
+            if max_pages and pages >= max_pages:
+                complete = False
+                break
+            interpreter.process_page(page)
+            pages += 1
+    finally:
+        device.close()
+    return output.getvalue().strip(), pages, complete
+
+
+def _plain_text_device(rsrcmgr, output: io.StringIO):
+    """
+    pdfminer device for the no-layout tier. With laparams=None pdfminer hands over loose
+    glyphs, and TextConverter would run every line together. This writes them in order,
+    adding a newline on a vertical jump and a space on a horizontal gap.
+    """
+    from pdfminer.converter import PDFLayoutAnalyzer
+    from pdfminer.layout import LTChar, LTContainer
+
+    class PlainTextDevice(PDFLayoutAnalyzer):
+        def receive_layout(self, ltpage):
+            prev = None
+
+            def render(item):
+                nonlocal prev
+                if isinstance(item, LTChar):
+                    if prev is not None:
+                        size = max(prev.height, item.height, 1.0)
+                        if abs(item.y0 - prev.y0) > size * 0.5:
+                            output.write("\n")
+                        elif item.x0 - prev.x1 > size * 0.2 and not (prev.get_text() + item.get_text()).isspace():
+                            output.write(" ")
+                    output.write(item.get_text())
+                    prev = item
+                elif isinstance(item, LTContainer):
+                    for child in item:
+                        render(child)
 
+            render(ltpage)
+            output.write("\n\f")
 
-def _extract_docx(file_bytes: bytes) -> str:
-    """Extract text from DOCX bytes using python-docx."""
+    return PlainTextDevice(rsrcmgr, laparams=None)
+
+
+def _fast_text_usable(text: str, pages: int, min_chars_per_page: int) -> bool:
+    """
+    Accept the no-layout text only if there is enough of it per page and it splits into
+    plausible words. Very long tokens mean glyphs were positioned without space characters
+    and the gap heuristic missed them.
+    """
+    if pages <= 0 or len(text) < min_chars_per_page * pages:
+        return False
+    words = text.split()
+    if not words:
+        return False
+    mean_len = sum(len(w) for w in words) / len(words)
+    long_ratio = sum(1 for w in words if len(w) > 25) / len(words)
+    garbled = text.count("\ufffd") + text.count("(cid:")
+    return 2.0 <= mean_len <= 12.0 and long_ratio <= 0.05 and garbled <= len(words) * 0.02
+
+
+def _extract_docx(stream: BinaryIO) -> str:
+    """Extract text from a DOCX file object using python-docx."""
     from docx import Document
 
-    doc = Document(io.BytesIO(file_bytes))
+    doc = Document(stream)
     paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
     return "\n".join(paragraphs)
+
+
+# ---------------------------------------------------------------------------
+# Extracted-text cache (content hash -> text)
+# ---------------------------------------------------------------------------
+
+_cache = None
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _text_cache():
+    """PersistentCache for extracted text, or None when disabled. Imported lazily so pool workers stay light."""
+    global _cache
+    from config import (
+        EXTRACT_CACHE_DISK,
+        EXTRACT_CACHE_ENABLED,
+        EXTRACT_CACHE_MAX_ENTRIES,
+        EXTRACT_CACHE_MEMORY_ENTRIES,
+        EXTRACT_CACHE_TTL_SECONDS,
+    )
+
+    if not EXTRACT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            from tools.cache import PersistentCache
+
+            _cache = PersistentCache(
+                "extracted_text",
+                ttl_seconds=EXTRACT_CACHE_TTL_SECONDS,
+                max_entries=EXTRACT_CACHE_MAX_ENTRIES,
+                memory_entries=EXTRACT_CACHE_MEMORY_ENTRIES,
+                persist=EXTRACT_CACHE_DISK,
+            )
+        return _cache
+
+
+def text_cache_key(file_bytes: Buffer, filename: str) -> str:
+    """Cache key for these bytes. The format is included: the same bytes named .docx vs .txt extract differently."""
+    return f"{detect_format(file_bytes, filename)}:{hashlib.sha256(file_bytes).hexdigest()}"
+
+
+def cached_text(key: str) -> Optional[str]:
+    """Previously extracted text for a text_cache_key, or None (counted as a hit / miss)."""
+    cache = _text_cache()
+    if cache is None:
+        return None
+    text = cache.get(key)
+    with _cache_lock:
+        _cache_stats["hits" if text is not None else "misses"] += 1
+    return text
+
+
+def store_text(key: str, text: str) -> None:
+    """Remember extracted text under a text_cache_key (empty results are not cached)."""
+    cache = _text_cache()
+    if cache is not None and text:
+        cache.set(key, text)
+
+
+def extraction_cache_stats() -> Dict[str, int]:
+    """Hit / miss counters for this process since startup."""
+    with _cache_lock:
+        return dict(_cache_stats)
@@ -0,0 +1,118 @@
+"""
+Upload Spool Tool
+Purpose: Hand an uploaded file to text extraction in the form the extractors read fastest.
+Uses: The size cap is checked against the upload's size before anything is read (the
+request body itself is capped while it arrives, in api.py). Uploads up to UPLOAD_SPOOL_BYTES
+are passed as bytes. Larger ones are copied once, off the event loop, into a named temporary
+file. The extractors read that file through mmap (in the parent for hashing, in the pool
+worker for parsing), so only its path crosses the process boundary, not the bytes.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXTRACT_MAX_BYTES, UPLOAD_SPOOL_BYTES
+from tools.text_extractor import Buffer, open_mapped
+
+_CHUNK_BYTES = 1024 * 1024
+
+
+class FileTooLarge(ValueError):
+    """Upload exceeds EXTRACT_MAX_BYTES."""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"File is {size:,} bytes; the limit is {limit:,} bytes")
+        self.size = size
+        self.limit = limit
+
+
+class SpooledUpload:
+    """
+    An upload held either in memory (`data`) or in a temporary file on disk (`path`).
+    Call close() when done; it removes the temporary file.
+    """
+
+    def __init__(self, filename: str, data: Optional[bytes] = None, path: Optional[str] = None, size: int = 0):
+        self.filename = filename
+        self.data = data
+        self.path = path
+        self.size = size
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """What the extractors accept: the bytes, or the temporary file's path."""
+        return self.data if self.path is None else self.path
+
+    @contextmanager
+    def buffer(self) -> Iterator[Buffer]:
+        """The content as a buffer without copying it (bytes, or an mmap of the file)."""
+        if self.path is None:
+            yield self.data or b""
+            return
+        with open_mapped(self.path) as mapped:
+            yield mapped
+
+    def close(self) -> None:
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self.data = None
+
+
+def _file_size(file: BinaryIO) -> int:
+    position = file.tell()
+    try:
+        file.seek(0, os.SEEK_END)
+        return file.tell()
+    finally:
+        file.seek(position)
+
+
+def _copy_to_temp(file: BinaryIO, max_bytes: int) -> str:
+    """Copy `file` from the start into a named temporary file; returns its path."""
+    file.seek(0)
+    copied = 0
+    with tempfile.NamedTemporaryFile(prefix="joblens-upload-", delete=False) as out:
+        try:
+            while True:
+                chunk = file.read(_CHUNK_BYTES)
+                if not chunk:
+                    break
+                copied += len(chunk)
+                if copied > max_bytes:
+                    raise FileTooLarge(copied, max_bytes)
+                out.write(chunk)
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+    return out.name
+
+
+async def read_upload(upload, max_bytes: int = EXTRACT_MAX_BYTES, spool_bytes: int = UPLOAD_SPOOL_BYTES) -> SpooledUpload:
+    """
+    Turn a FastAPI UploadFile into a SpooledUpload: bytes when small, else a temporary file.
+
+    Raises:
+        FileTooLarge: the upload is larger than max_bytes (checked before reading it)
+    """
+    size = upload.size
+    if size is None:
+        size = await asyncio.to_thread(_file_size, upload.file)
+    if size > max_bytes:
+        raise FileTooLarge(size, max_bytes)
+    filename = upload.filename or ""
+    if size <= spool_bytes:
+        await upload.seek(0)
+        return SpooledUpload(filename, data=await upload.read(), size=size)
+    path = await asyncio.to_thread(_copy_to_temp, upload.file, max_bytes)
+    return SpooledUpload(filename, path=path, size=size)